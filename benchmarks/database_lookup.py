@@ -0,0 +1,72 @@
+"""
+Times the stored data path against the configured database backend: ingesting
+a submission history, then the lookups commands make. With DB_BACKEND=sqlite
+it needs no server.
+
+    DB_BACKEND=sqlite DB_PATH=/tmp/bench.sqlite3 python -m benchmarks.database_lookup --submissions 5000
+"""
+
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+from typing import Callable, List
+
+from codeforces.submission import Submission
+from codeforces.submission_sync import get_solved_leaderboard, get_sync_state, load_stored_frame, store_submissions
+from database.create_database import add_tables
+from database.database import Database
+
+VERDICTS = ["OK", "OK", "WRONG_ANSWER", "TIME_LIMIT_EXCEEDED"]
+
+
+def make_submissions(handle: str, count: int, seed: int) -> List[Submission]:
+    rng = Random(seed)
+    submissions = []
+    for i in range(count):
+        contest_id = rng.randint(1, 2000)
+        problem = {"contestId": contest_id, "index": rng.choice("ABCDEF"), "name": "Problem", "type": "PROGRAMMING",
+                   "rating": rng.choice([800, 1200, 1600, 2000]), "tags": ["math"]}
+        submissions.append(Submission({
+            "id": i + 1, "contestId": contest_id, "creationTimeSeconds": 1600000000 + i, "relativeTimeSeconds": 0,
+            "problem": problem, "author": {"members": [{"handle": handle}], "participantType": "PRACTICE"},
+            "programmingLanguage": "GNU C++17", "verdict": rng.choice(VERDICTS), "testset": "TESTS",
+            "passedTestCount": 10, "timeConsumedMillis": 46, "memoryConsumedBytes": 102400,
+        }))
+    return submissions
+
+
+def time_calls(name: str, repeat: int, fn: Callable[[], object]):
+    start = perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = perf_counter() - start
+    print(f"{name:<24}{repeat:>8}{elapsed / repeat * 1000:>12.3f}")
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--handle", default="benchmark_user")
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    Database.establish_connection()
+    add_tables()
+    submissions = make_submissions(args.handle, args.submissions, args.seed)
+    handle = args.handle.lower()
+
+    print(f"backend: {Database.dialect()}")
+    print(f"{'operation':<24}{'calls':>8}{'ms/call':>12}")
+    time_calls("store_submissions", 1, lambda: store_submissions(handle, submissions, args.submissions))
+    time_calls("get_sync_state", args.repeat, lambda: get_sync_state(handle))
+    time_calls("get_solved_leaderboard", args.repeat, get_solved_leaderboard)
+    time_calls("load_stored_frame", max(args.repeat // 100, 1), lambda: load_stored_frame(handle))
+
+    for table in ("submissions", "submission_sync", "solved_problems", "solved_counts"):
+        Database.execute_query(f"DELETE FROM {table} WHERE handle = %s", handle)
+    Database.terminate_connection()
+
+
+if __name__ == "__main__":
+    main()
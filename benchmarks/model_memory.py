@@ -0,0 +1,160 @@
+"""
+Compares the memory held by the Codeforces models against the dict based
+versions they replaced, on a synthetic dataset decoded from JSON like the API
+responses are.
+
+    python -m benchmarks.model_memory --users 200 --submissions 1000
+"""
+
+from argparse import ArgumentParser
+from gc import collect
+from json import dumps, loads
+from random import Random
+from tracemalloc import get_traced_memory, start, stop
+from typing import Any, Callable, Dict, List, Optional
+
+from codeforces.problem import Problem
+from codeforces.rating_change import RatingChange
+from codeforces.submission import Submission
+from codeforces.user import User
+
+TAGS = ["dp", "greedy", "math", "graphs", "strings", "implementation", "brute force", "data structures"]
+LANGUAGES = ["GNU C++17", "GNU C++20 (64)", "Python 3", "PyPy 3-64", "Java 21"]
+VERDICTS = ["OK", "OK", "OK", "WRONG_ANSWER", "TIME_LIMIT_EXCEEDED", "RUNTIME_ERROR"]
+
+
+class LegacyUser:
+    def __init__(self, handle: str, user_data: Dict[str, Any]):
+        self.handle = handle
+        for field in ("email", "firstName", "lastName", "country", "city", "organization", "contribution", "rank",
+                      "rating", "maxRank", "maxRating", "lastOnlineTimeSeconds", "registrationTimeSeconds",
+                      "friendOfCount", "avatar", "titlePhoto"):
+            setattr(self, field, user_data.get(field, None))
+        self.rating_changes = None
+        self.submissions = None
+
+
+class LegacySubmission:
+    def __init__(self, data: Dict[str, Any]):
+        self.id = data["id"]
+        self.contest_id = data.get("contestId", None)
+        self.creationTimeSeconds = data["creationTimeSeconds"]
+        self.relativeTimeSeconds = data["relativeTimeSeconds"]
+        self.problem = data["problem"]
+        self.author = data["author"]
+        self.programmingLanguage = data["programmingLanguage"]
+        self.verdict = data["verdict"]
+        self.testset = data["testset"]
+        self.passedTestCount = data["passedTestCount"]
+        self.timeConsumedMillis = data["timeConsumedMillis"]
+        self.memoryConsumedBytes = data["memoryConsumedBytes"]
+        self.points = data.get("points", None)
+
+
+class LegacyRatingChange:
+    def __init__(self, data: Dict[str, Any]):
+        for field in ("contestId", "contestName", "handle", "rank", "ratingUpdateTimeSeconds", "oldRating",
+                      "newRating"):
+            setattr(self, field, data[field])
+
+
+class LegacyProblem:
+    def __init__(self, data: Dict[str, Any]):
+        self.contestId = data.get("contestId", None)
+        self.problemsetName = data.get("problemsetName", None)
+        self.index = data["index"]
+        self.name = data["name"]
+        self.type = data["type"]
+        self.rating = data.get("rating", None)
+        self.tags = data["tags"]
+
+
+def make_dataset(users: int, submissions: int, rating_changes: int, problems: int, seed: int) -> Dict[str, str]:
+    """
+    :returns: JSON text per model, so every object is decoded with its own strings like an API response
+    """
+    rng = Random(seed)
+    problem_data = [
+        {
+            "contestId": 1 + i // 5, "index": "ABCDE"[i % 5], "name": f"Problem {i}", "type": "PROGRAMMING",
+            "rating": rng.choice([800, 1200, 1600, 2000, 2400]), "tags": rng.sample(TAGS, 3),
+        }
+        for i in range(problems)
+    ]
+    user_data = [
+        {
+            "handle": f"user{i}", "firstName": "First", "lastName": "Last", "country": "India", "city": "Kochi",
+            "organization": "College", "contribution": 0, "rank": "expert", "rating": 1700, "maxRank": "expert",
+            "maxRating": 1800, "lastOnlineTimeSeconds": 1700000000, "registrationTimeSeconds": 1600000000,
+            "friendOfCount": 3, "avatar": "https://userpic.codeforces.org/no-avatar.jpg",
+            "titlePhoto": "https://userpic.codeforces.org/no-title.jpg",
+        }
+        for i in range(users)
+    ]
+    submission_data = [
+        {
+            "id": i, "contestId": problem["contestId"], "creationTimeSeconds": 1600000000 + i,
+            "relativeTimeSeconds": 2147483647, "problem": problem,
+            "author": {"contestId": problem["contestId"], "members": [{"handle": f"user{i % users}"}],
+                       "participantType": "PRACTICE", "ghost": False, "startTimeSeconds": 1600000000},
+            "programmingLanguage": rng.choice(LANGUAGES), "verdict": rng.choice(VERDICTS), "testset": "TESTS",
+            "passedTestCount": 10, "timeConsumedMillis": 46, "memoryConsumedBytes": 102400,
+        }
+        for i, problem in enumerate(rng.choice(problem_data) for _ in range(users * submissions))
+    ]
+    rating_change_data = [
+        {
+            "contestId": 1 + i % 500, "contestName": f"Codeforces Round {1 + i % 500}", "handle": f"user{i % users}",
+            "rank": 1000, "ratingUpdateTimeSeconds": 1600000000 + i, "oldRating": 1500, "newRating": 1520,
+        }
+        for i in range(users * rating_changes)
+    ]
+    return {
+        "users": dumps(user_data),
+        "submissions": dumps(submission_data),
+        "rating_changes": dumps(rating_change_data),
+        "problems": dumps(problem_data),
+    }
+
+
+def measure(text: str, build: Callable[[Dict[str, Any]], Any]) -> int:
+    """
+    :returns: bytes still allocated once the decoded JSON is dropped and only the models remain
+    """
+    collect()
+    start()
+    objects: Optional[List[Any]] = [build(data) for data in loads(text)]
+    collect()
+    held, _ = get_traced_memory()
+    stop()
+    del objects
+    return held
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--submissions", type=int, default=1000, help="per user")
+    parser.add_argument("--rating-changes", type=int, default=50, help="per user")
+    parser.add_argument("--problems", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = make_dataset(args.users, args.submissions, args.rating_changes, args.problems, args.seed)
+    models = [
+        ("users", lambda data: LegacyUser(data["handle"], data), lambda data: User(data["handle"], data)),
+        ("submissions", LegacySubmission, Submission),
+        ("rating_changes", LegacyRatingChange, RatingChange),
+        ("problems", LegacyProblem, Problem),
+    ]
+
+    print(f"{'model':<16}{'count':>10}{'legacy KB':>12}{'slotted KB':>12}{'saved':>8}")
+    for name, legacy, slotted in models:
+        count = len(loads(dataset[name]))
+        before = measure(dataset[name], legacy)
+        after = measure(dataset[name], slotted)
+        print(f"{name:<16}{count:>10}{before / 1024:>12.0f}{after / 1024:>12.0f}{1 - after / before:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,654 @@
-from requests import get
-from typing import Any, List, Dict, Tuple
-from logging import error, debug
+from asyncio import AbstractEventLoop, Future, Task, gather, get_running_loop, run, shield, sleep
+from collections import OrderedDict
+from json import dumps, loads
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientError
+from enum import IntEnum
+from functools import partial
+from heapq import heappush, heappop, heapify
+from itertools import count
+from re import search
+from threading import Lock
+from time import monotonic, time
+from typing import Any, Awaitable, Callable, Iterator, List, Dict, Optional, Tuple, TypeVar
+from logging import error, debug, warning
+
+T = TypeVar("T")
+
+API_URL = "https://codeforces.com/api"
+
+# Timeouts are in seconds. problemset.problems is a few MB, so the total
+# timeout has to leave room for the body to arrive.
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+TOTAL_TIMEOUT = 30
+
+MAX_CONNECTIONS = 4
+KEEPALIVE_TIMEOUT = 60
+
+# Codeforces allows roughly one call every two seconds per client.
+CALLS_PER_SECOND = 0.5
+BURST = 1
+MAX_RETRIES = 3
+THROTTLE_BACKOFF = 4
+
+# user.info lookups issued within this many seconds are merged into one call.
+USER_INFO_WINDOW = 0.05
+MAX_URL_LENGTH = 4000
+
+# endpoint: (ttl, stale_ttl) in seconds. Entries younger than ttl are served
+# as is, entries up to ttl + stale_ttl old are served while being refreshed
+# in the background, anything older is refetched before answering.
+CACHE_POLICIES: Dict[str, Tuple[float, float]] = {
+    "user.info": (10 * 60, 60 * 60),
+    "user.rating": (6 * 60 * 60, 7 * 24 * 60 * 60),
+    "user.status": (5 * 60, 60 * 60),
+    "problemset.problems": (6 * 60 * 60, 24 * 60 * 60),
+}
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class CodeforcesAPIError(Exception):
+    def __init__(self, message: str, comment: Optional[str] = None):
+        super().__init__(message)
+        self.comment = comment
+
+
+class CallLimitExceeded(CodeforcesAPIError):
+    pass
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every Codeforces call. Waiting callers are served
+    lowest priority value first and in arrival order within a lane.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens: float = capacity
+        self._updated = monotonic()
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = count()
+        # The sync wrappers run on their own event loops, so this has to be a thread lock.
+        self._lock = Lock()
+
+        self._queued: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._served: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._total_wait: Dict[Priority, float] = {priority: 0.0 for priority in Priority}
+        self._max_wait: Dict[Priority, float] = {priority: 0.0 for priority in Priority}
+        self._throttled = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_acquire(self, entry: Tuple[int, int]) -> float:
+        """
+        :returns: 0 if a token was taken, otherwise the seconds to wait before retrying
+        """
+        with self._lock:
+            self._refill(monotonic())
+            if self._waiters[0] == entry and self._tokens >= 1:
+                self._tokens -= 1
+                heappop(self._waiters)
+                return 0
+            return max((1 - self._tokens) / self.rate, self.POLL_INTERVAL)
+
+    def _remove(self, entry: Tuple[int, int]):
+        with self._lock:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapify(self._waiters)
+
+    async def acquire(self, priority: Priority):
+        entry = (int(priority), next(self._seq))
+        with self._lock:
+            heappush(self._waiters, entry)
+            self._queued[priority] += 1
+
+        start = monotonic()
+        try:
+            while (delay := self._try_acquire(entry)) > 0:
+                await sleep(delay)
+        except BaseException:
+            self._remove(entry)
+            raise
+        finally:
+            with self._lock:
+                self._queued[priority] -= 1
+
+        waited = monotonic() - start
+        with self._lock:
+            self._served[priority] += 1
+            self._total_wait[priority] += waited
+            self._max_wait[priority] = max(self._max_wait[priority], waited)
+
+    def penalize(self, seconds: float):
+        """
+        Pushes the next available token back, used when Codeforces says we are going too fast.
+        """
+        with self._lock:
+            self._refill(monotonic())
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+            self._throttled += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lanes: Dict[str, Any] = {}
+            for priority in Priority:
+                served = self._served[priority]
+                lanes[priority.name.lower()] = {
+                    "queued": self._queued[priority],
+                    "served": served,
+                    "avg_wait": self._total_wait[priority] / served if served else 0.0,
+                    "max_wait": self._max_wait[priority],
+                }
+            return {"lanes": lanes, "throttled": self._throttled}
+
+
+rate_limiter = RateLimiter(CALLS_PER_SECOND, BURST)
+
+
+class CFClient:
+    """
+    Holds one keep-alive aiohttp session per event loop.
+    """
+
+    _sessions: Dict[AbstractEventLoop, ClientSession] = {}
+
+    @classmethod
+    async def get_session(cls) -> ClientSession:
+        loop = get_running_loop()
+        session = cls._sessions.get(loop)
+        if session is None or session.closed:
+            connector = TCPConnector(
+                limit=MAX_CONNECTIONS,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+            timeout = ClientTimeout(
+                total=TOTAL_TIMEOUT,
+                sock_connect=CONNECT_TIMEOUT,
+                sock_read=READ_TIMEOUT,
+            )
+            session = ClientSession(connector=connector, timeout=timeout)
+            cls._sessions[loop] = session
+        return session
+
+    @classmethod
+    async def close(cls):
+        session = cls._sessions.pop(get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+
+def _run_sync(coro: Awaitable[T]) -> T:
+    """
+    Runs an api coroutine to completion from synchronous code.
+
+    :raises RuntimeError: if called from inside a running event loop, await
+        the ``*_async`` variant there instead
+    """
+    try:
+        get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        coro.close()  # type: ignore
+        raise RuntimeError("Synchronous Codeforces API call inside the event loop, use the async variant.")
+
+    async def runner() -> T:
+        try:
+            return await coro
+        finally:
+            await CFClient.close()
+
+    return run(runner())
+
+
+async def _send_query(url: str) -> Any:
+    """
+    :raises CallLimitExceeded: if Codeforces throttled the call
+    :raises CodeforcesAPIError: if the call failed for any other reason
+    """
+    session = await CFClient.get_session()
+    try:
+        async with session.get(url) as response:
+            if response.status == 503:
+                raise CallLimitExceeded(f"Codeforces is unavailable: {url}")
+            body = await response.text()
+    except (ClientError, TimeoutError) as exc:
+        error(f"Failed to query: {url} exc: {exc!r}")
+        raise CodeforcesAPIError(f"Failed to query: {url}") from exc
+
+    # Successful responses always start like this, so the body only has to be parsed once by the caller.
+    if response.status == 200 and body.startswith('{"status":"OK"'):
+        return body
+
+    try:
+        data = loads(body)
+    except ValueError:
+        data = None
+    if response.status == 200 and isinstance(data, dict) and data.get("status") == "OK":
+        return body
+
+    comment: Optional[str] = data.get("comment") if isinstance(data, dict) else None
+    if comment is not None and "Call limit exceeded" in comment:
+        raise CallLimitExceeded(f"{comment}: {url}")
+    error(f"Failed to query: {url} status: {response.status} comment: {comment}")
+    raise CodeforcesAPIError(f"Failed to query: {url} comment: {comment}", comment)
+
+
+async def _fetch_body(url: str, priority: Priority) -> str:
+    attempt = 0
+    while True:
+        await rate_limiter.acquire(priority)
+        debug("Sending Query: %s", url)
+        try:
+            body = await _send_query(url)
+            break
+        except CallLimitExceeded:
+            attempt += 1
+            if attempt >= MAX_RETRIES:
+                raise
+            warning(f"Codeforces call limit hit, backing off: {url}")
+            rate_limiter.penalize(THROTTLE_BACKOFF * attempt)
+
+    # Lazy formatting, the body can be several MB and DEBUG is normally off.
+    debug("Response: %s", body)
+    return body
+
+
+async def query_api_async(url: str, priority: Priority = Priority.INTERACTIVE) -> Any:
+    return loads(await _fetch_body(url, priority))
+
+
+class CacheEntry:
+    __slots__ = ("body", "fetched_at", "size")
+
+    def __init__(self, key: str, body: str):
+        self.body = body
+        self.fetched_at = monotonic()
+        self.size = len(key) + len(body)
+
+
+class ResponseCache:
+    """
+    LRU cache of raw response bodies bounded by max_bytes, with per endpoint
+    ttl and stale-while-revalidate windows taken from CACHE_POLICIES.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, Task[str]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, endpoint: str, stat: str):
+        stats = self._stats.setdefault(
+            endpoint, {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+        )
+        stats[stat] += 1
+
+    def _put(self, endpoint: str, key: str, body: str):
+        self._drop(key)
+        entry = CacheEntry(key, body)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._count(evicted_key.split(":", 1)[0], "evictions")
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _load(
+        self, endpoint: str, key: str, loader: Callable[[Priority], Awaitable[str]], priority: Priority
+    ) -> "Task[str]":
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is get_running_loop():
+            return task
+
+        async def load() -> str:
+            try:
+                body = await loader(priority)
+                self._put(endpoint, key, body)
+                return body
+            finally:
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+
+        task = get_running_loop().create_task(load())
+        self._inflight[key] = task
+        return task
+
+    @staticmethod
+    def _log_refresh_failure(task: "Task[str]"):
+        if not task.cancelled() and task.exception() is not None:
+            warning(f"Background cache refresh failed: {task.exception()!r}")
+
+    async def fetch(
+        self,
+        endpoint: str,
+        key: str,
+        loader: Callable[[Priority], Awaitable[str]],
+        priority: Priority = Priority.INTERACTIVE,
+        fresh: bool = False,
+    ) -> str:
+        """
+        Returns the cached body for key, calling loader(priority) when it is missing or expired.
+
+        :param fresh: skip the cached body and always load, the new body still replaces the cached one
+        """
+        return (await self.fetch_timed(endpoint, key, loader, priority, fresh))[0]
+
+    async def fetch_timed(
+        self,
+        endpoint: str,
+        key: str,
+        loader: Callable[[Priority], Awaitable[str]],
+        priority: Priority = Priority.INTERACTIVE,
+        fresh: bool = False,
+    ) -> Tuple[str, float]:
+        """
+        Like fetch, also returning the unix time the body was downloaded, which lags
+        behind now when a cached or stale body is served.
+        """
+        key = f"{endpoint}:{key}"
+        ttl, stale_ttl = CACHE_POLICIES.get(endpoint, (0, 0))
+        entry = None if fresh else self._entries.get(key)
+        if entry is not None:
+            age = monotonic() - entry.fetched_at
+            if age < ttl:
+                self._entries.move_to_end(key)
+                self._count(endpoint, "hits")
+                return entry.body, time() - age
+            if age < ttl + stale_ttl:
+                self._entries.move_to_end(key)
+                self._count(endpoint, "stale_hits")
+                if key not in self._inflight:
+                    self._count(endpoint, "refreshes")
+                    task = self._load(endpoint, key, loader, Priority.BACKGROUND)
+                    task.add_done_callback(self._log_refresh_failure)
+                return entry.body, time() - age
+
+        self._count(endpoint, "misses")
+        # Shielded so one cancelled caller does not cancel the load for everyone waiting on it.
+        return await shield(self._load(endpoint, key, loader, priority)), time()
+
+    def invalidate(self, endpoint: str, key: Optional[str] = None):
+        if key is not None:
+            self._drop(f"{endpoint}:{key}")
+            return
+        for cached_key in [k for k in self._entries if k.startswith(f"{endpoint}:")]:
+            self._drop(cached_key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "endpoints": {endpoint: dict(stats) for endpoint, stats in self._stats.items()},
+        }
+
+
+response_cache = ResponseCache(CACHE_MAX_BYTES)
+
+
+async def _cached_query(endpoint: str, url: str, priority: Priority, fresh: bool = False) -> Any:
+    body = await response_cache.fetch(endpoint, url, lambda p: _fetch_body(url, p), priority, fresh)
+    return loads(body)
+
+
+def _chunk_handles(handles: List[str]) -> Iterator[List[str]]:
+    """
+    Splits handles into groups whose user.info url stays under MAX_URL_LENGTH.
+    """
+    base_length = len(f"{API_URL}/user.info?handles=")
+    chunk: List[str] = []
+    length = base_length
+    for handle in handles:
+        if chunk and length + len(handle) + 1 > MAX_URL_LENGTH:
+            yield chunk
+            chunk, length = [], base_length
+        chunk.append(handle)
+        length += len(handle) + 1
+    if chunk:
+        yield chunk
+
+
+class UserInfoBatcher:
+    """
+    Coalesces user.info lookups from concurrent callers. Handles requested
+    within USER_INFO_WINDOW of each other are fetched together, deduplicated
+    and chunked, and every caller gets back only the profiles it asked for.
+    """
+
+    _instances: Dict[AbstractEventLoop, "UserInfoBatcher"] = {}
+
+    @classmethod
+    def get_instance(cls) -> "UserInfoBatcher":
+        loop = get_running_loop()
+        if loop not in cls._instances:
+            cls._instances = {
+                other: batcher for other, batcher in cls._instances.items() if not other.is_closed()
+            }
+            cls._instances[loop] = cls()
+        return cls._instances[loop]
+
+    def __init__(self):
+        self._pending: Dict[str, Tuple[str, List[Future[Dict[str, Any]]]]] = {}
+        self._priority = Priority.BACKGROUND
+        self._flush_task: Optional[Task[None]] = None
+
+    async def fetch(self, handles: List[str], priority: Priority) -> List[Dict[str, Any]]:
+        loop = get_running_loop()
+        futures: List[Future[Dict[str, Any]]] = []
+        for handle in handles:
+            future: Future[Dict[str, Any]] = loop.create_future()
+            self._pending.setdefault(handle.lower(), (handle, []))[1].append(future)
+            futures.append(future)
+
+        self._priority = min(self._priority, priority)
+        if self._flush_task is None:
+            batch: Dict[str, Tuple[str, List[Future[Dict[str, Any]]]]] = {}
+            self._flush_task = loop.create_task(self._flush(batch))
+            self._flush_task.add_done_callback(partial(self._flush_done, batch))
+
+        results = await gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results  # type: ignore
+
+    async def _flush(self, batch: Dict[str, Tuple[str, List[Future[Dict[str, Any]]]]]):
+        """
+        :param batch: filled with the handles this flush takes, for _flush_done to fail if it dies
+        """
+        await sleep(USER_INFO_WINDOW)
+        batch.update(self._pending)
+        self._pending = {}
+        priority, self._priority = self._priority, Priority.BACKGROUND
+        self._flush_task = None
+
+        chunks = _chunk_handles([handle for handle, _ in batch.values()])
+        await gather(*(self._resolve(chunk, batch, priority) for chunk in chunks))
+
+    def _flush_done(self, batch: Dict[str, Tuple[str, List[Future[Dict[str, Any]]]]], task: "Task[None]"):
+        """
+        Fails the callers a flush left waiting, so a flush that crashed or was cancelled
+        doesn't hang them, or every later caller behind a flush task that never clears.
+        """
+        if self._flush_task is task:
+            # Ended during the window, the handles it would have taken are still pending.
+            self._flush_task = None
+            batch, self._pending = self._pending, {}
+            self._priority = Priority.BACKGROUND
+        if task.cancelled():
+            for _, futures in batch.values():
+                for future in futures:
+                    future.cancel()
+            return
+        exc = task.exception()
+        if exc is not None:
+            error(f"user.info flush of {len(batch)} handles failed: {exc!r}")
+        else:
+            exc = CodeforcesAPIError("user.info returned no profile for the handle")
+        for _, futures in batch.values():
+            self._settle(futures, exc=exc)
+
+    @staticmethod
+    def _settle(futures: List[Future[Dict[str, Any]]], result: Any = None, exc: Optional[BaseException] = None):
+        for future in futures:
+            if future.done():
+                continue
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    async def _resolve(
+        self,
+        chunk: List[str],
+        pending: Dict[str, Tuple[str, List[Future[Dict[str, Any]]]]],
+        priority: Priority,
+    ):
+        while chunk:
+            url = f"{API_URL}/user.info?handles={';'.join(chunk)}"
+            try:
+                users_data = (await query_api_async(url, priority))["result"]
+            except CodeforcesAPIError as exc:
+                # A single unknown handle fails the whole call, drop it and retry the rest.
+                match = search(r"User with handle (\S+) not found", exc.comment or "")
+                missing = match.group(1).lower() if match else None
+                if missing not in [handle.lower() for handle in chunk] or len(chunk) == 1:
+                    for handle in chunk:
+                        self._settle(pending[handle.lower()][1], exc=exc)
+                    return
+                self._settle(pending[missing][1], exc=exc)
+                chunk = [handle for handle in chunk if handle.lower() != missing]
+                continue
+            except BaseException as exc:
+                for handle in chunk:
+                    self._settle(pending[handle.lower()][1], exc=exc)
+                raise
+
+            for handle, user_data in zip(chunk, users_data):
+                self._settle(pending[handle.lower()][1], result=user_data)
+            return
+
+
+async def users_info_async(
+    handles: List[str],
+    priority: Priority = Priority.INTERACTIVE,
+    return_exceptions: bool = False,
+    fresh: bool = False,
+) -> List[Any]:
+    """
+    :param return_exceptions: put the error of a handle that couldn't be fetched in its place
+        instead of raising it, so one bad handle doesn't fail the others
+    :param fresh: bypass the cached profiles, the fetched ones still refresh the cache
+    """
+    if not handles:
+        return []
+
+    batcher = UserInfoBatcher.get_instance()
+
+    async def fetch(handle: str) -> Dict[str, Any]:
+        async def loader(p: Priority) -> str:
+            return dumps((await batcher.fetch([handle], p))[0])
+
+        return loads(await response_cache.fetch("user.info", handle.lower(), loader, priority, fresh))
+
+    return list(await gather(*(fetch(handle) for handle in handles), return_exceptions=return_exceptions))
+
+
+async def user_rating_async(
+    handle: str, priority: Priority = Priority.INTERACTIVE, fresh: bool = False
+) -> List[Any]:
+    """
+    :param fresh: bypass the cached history, for callers that store it as synced now
+    """
+    url = f"{API_URL}/user.rating?handle={handle}"
+    return (await _cached_query("user.rating", url, priority, fresh))["result"]
+
+
+async def user_status_async(
+    handle: str, count: int = 100, priority: Priority = Priority.INTERACTIVE
+) -> List[Any]:
+    url = f"{API_URL}/user.status?handle={handle}&count={count}"
+    return (await _cached_query("user.status", url, priority))["result"]
+
+
+async def user_status_page_async(
+    handle: str, from_: int, count: int, priority: Priority = Priority.BACKGROUND
+) -> List[Dict[str, Any]]:
+    """
+    One page of a user's submissions, newest first, starting at the 1-based position from_.
+    Not cached, callers use it to sync and need to see new submissions right away.
+    """
+    url = f"{API_URL}/user.status?handle={handle}&from={from_}&count={count}"
+    return (await query_api_async(url, priority))["result"]
+
+
+async def problemset_problems_async(
+    priority: Priority = Priority.BACKGROUND,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    problems, problems_stats, _ = await problemset_problems_timed_async(priority)
+    return problems, problems_stats
+
+
+async def problemset_problems_timed_async(
+    priority: Priority = Priority.BACKGROUND,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], float]:
+    """
+    :returns: (problems, problemStatistics, unix time Codeforces sent them), older than now when served from the cache
+    """
+    url = f"{API_URL}/problemset.problems"
+    body, fetched_at = await response_cache.fetch_timed(
+        "problemset.problems", url, lambda p: _fetch_body(url, p), priority
+    )
+    data = loads(body)
+    return data["result"]["problems"], data["result"]["problemStatistics"], fetched_at
+
+
+async def close_api_session():
+    await CFClient.close()
+
+
+def get_api_stats() -> Dict[str, Any]:
+    return {"scheduler": rate_limiter.get_stats(), "cache": response_cache.get_stats()}
 
 
 def query_api(url: str) -> Any:
-    debug(f"Sending Query: {url}")
-    response = get(url)
-    if response.status_code != 200:
-        error(f"Failed to query: {url}") 
-        raise Exception(f"Failed to query: {url}")
-    
-    debug(f"Response: {response.json()}")
-    return response.json()
+    return _run_sync(query_api_async(url))
 
 
 def users_info(handles: List[str]) -> List[Dict[str, Any]]:
-    url = f"https://codeforces.com/api/user.info?handles={';'.join(handles)}"
-    return query_api(url)["result"]
+    return _run_sync(users_info_async(handles))
 
 
 def user_rating(handle: str) -> List[Any]:
-    url = f"https://codeforces.com/api/user.rating?handle={handle}"
-    return query_api(url)["result"]
+    return _run_sync(user_rating_async(handle))
 
 
 def user_status(handle: str, count: int = 100) -> List[Any]:
-    url = f"https://codeforces.com/api/user.status?handle={handle}&count={count}"
-    return query_api(url)["result"]
+    return _run_sync(user_status_async(handle, count))
+
 
 def problemset_problems() -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    url = "https://codeforces.com/api/problemset.problems"
-    data = query_api(url)
-    return data["result"]["problems"], data["result"]["problemStatistics"]
\ No newline at end of file
+    return _run_sync(problemset_problems_async())
@@ -0,0 +1,502 @@
+from asyncio import get_running_loop, to_thread
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from hashlib import sha256
+from io import BytesIO
+from json import dumps
+from multiprocessing import get_context
+from threading import Lock
+from os import makedirs, remove, replace, scandir, utime
+from os.path import join
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from logging import info, warning
+from matplotlib import colormaps
+from matplotlib.axes import Axes
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.dates import DateFormatter
+from matplotlib.figure import Figure
+import numpy as np
+
+from config import GRAPH_CACHE_DIR, GRAPH_CACHE_DISK_MAX_BYTES, GRAPH_PROFILE
+
+MAX_RENDER_WORKERS = 2
+# Renders allowed to wait for a worker, anything beyond this is turned away.
+MAX_QUEUED_RENDERS = 6
+
+GRAPH_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# A disk tier over its budget is pruned down to this fraction of it, so the next puts don't prune again.
+GRAPH_CACHE_PRUNE_TO = 0.8
+
+
+class OutputProfile(NamedTuple):
+    name: str
+    dpi: int
+    # png or webp
+    format: str
+    # Images over this are re-encoded at a lower dpi, down to MIN_DPI.
+    max_bytes: int
+    # webp only
+    quality: int = 80
+    # Fit the layout to the labels and crop to the drawn content, both measure
+    # every text again. Profiles without it use margins fixed per chart.
+    tight: bool = True
+
+
+OUTPUT_PROFILES: Dict[str, OutputProfile] = {
+    "preview": OutputProfile("preview", dpi=60, format="webp", max_bytes=150 * 1024, quality=70, tight=False),
+    "standard": OutputProfile("standard", dpi=120, format="png", max_bytes=1024 * 1024),
+    "hq": OutputProfile("hq", dpi=300, format="png", max_bytes=8 * 1024 * 1024),
+}
+DEFAULT_PROFILE = OUTPUT_PROFILES.get(GRAPH_PROFILE, OUTPUT_PROFILES["hq"])
+MIN_DPI = 40
+MAX_ENCODE_ATTEMPTS = 3
+
+# (lower bound, upper bound, color, rank), bounds of None are open ended.
+RANK_BANDS: List[Tuple[Optional[int], Optional[int], str, str]] = [
+    (3000, None, 'red', 'Legendary Grandmaster'),
+    (2600, 3000, 'red', 'International Grandmaster'),
+    (2400, 2600, 'red', 'Grandmaster'),
+    (2300, 2400, 'orange', 'International Master'),
+    (2100, 2300, 'orange', 'Master'),
+    (1900, 2100, 'violet', 'Candidate Master'),
+    (1600, 1900, 'blue', 'Expert'),
+    (1400, 1600, 'cyan', 'Specialist'),
+    (1200, 1400, 'green', 'Pupil'),
+    (None, 1200, 'gray', 'Newbie'),
+]
+# Stands in for the open ends, far outside any rating so the band always fills the view.
+_BAND_LIMIT = 100_000
+
+# (handle, rating update times in unix seconds, new ratings)
+RatingSeries = Tuple[str, List[int], List[int]]
+
+
+class RenderQueueFull(Exception):
+    pass
+
+
+class GraphCache:
+    """
+    Rendered images keyed by a hash of the chart type and its input data, so new
+    rating changes or submissions produce a new key and old images simply age
+    out. Memory is an LRU bounded by max_bytes, the optional disk tier under
+    directory keeps images across restarts and is bounded by max_disk_bytes,
+    dropping the files read or written longest ago first.
+    """
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None, max_disk_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._images: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        # Counted from the directory on the first write, then kept up to date.
+        self._disk_bytes: Optional[int] = None
+        self._disk_lock = Lock()
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "disk_pruned": 0}
+
+    @staticmethod
+    def make_key(render_fn: Callable[..., bytes], args: Tuple[Any, ...]) -> str:
+        payload = dumps([render_fn.__name__, args], separators=(",", ":"), default=str)
+        return sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str, format: str) -> str:
+        assert self.directory is not None
+        return join(self.directory, f"{key}.{format}")
+
+    def _remember(self, key: str, image: bytes):
+        if len(image) > self.max_bytes or key in self._images:
+            return
+        self._images[key] = image
+        self._bytes += len(image)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _read_disk(self, key: str, format: str) -> Optional[bytes]:
+        path = self._path(key, format)
+        try:
+            with open(path, "rb") as file:
+                image = file.read()
+            # Pruning goes by mtime, a hit keeps the file around like a fresh write.
+            utime(path)
+            return image
+        except OSError:
+            return None
+
+    def _disk_files(self) -> List[Tuple[float, int, str]]:
+        """
+        :returns: (mtime, size, path) of every cached image, oldest first
+        """
+        assert self.directory is not None
+        files: List[Tuple[float, int, str]] = []
+        with scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        return files
+
+    def _prune_disk(self):
+        """
+        Deletes the oldest images until the disk tier is under GRAPH_CACHE_PRUNE_TO of its budget.
+        """
+        files = self._disk_files()
+        total = sum(size for _, size, _ in files)
+        pruned = 0
+        for _, size, path in files:
+            if total <= self.max_disk_bytes * GRAPH_CACHE_PRUNE_TO:
+                break
+            try:
+                remove(path)
+            except OSError:
+                continue
+            total -= size
+            pruned += 1
+        self._disk_bytes = total
+        self.stats["disk_pruned"] += pruned
+        info(f"Pruned {pruned} graphs from the disk cache, {total} bytes left.")
+
+    def _write_disk(self, key: str, image: bytes, format: str):
+        assert self.directory is not None
+        makedirs(self.directory, exist_ok=True)
+        path = self._path(key, format)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(image)
+        with self._disk_lock:
+            replace(tmp_path, path)
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(image)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._prune_disk()
+
+    async def get(self, key: str, format: str) -> Optional[bytes]:
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return image
+        if self.directory is not None:
+            image = await to_thread(self._read_disk, key, format)
+            if image is not None:
+                self._remember(key, image)
+                self.stats["disk_hits"] += 1
+                return image
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, image: bytes, format: str):
+        self._remember(key, image)
+        if self.directory is not None:
+            try:
+                await to_thread(self._write_disk, key, image, format)
+            except OSError as exc:
+                warning(f"Failed to write graph to the disk cache: {exc!r}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._images), "bytes": self._bytes, "disk_bytes": self._disk_bytes, **self.stats}
+
+
+class GraphRenderer:
+    """
+    Renders charts in a bounded process pool, so matplotlib never runs on the
+    event loop. Render functions take plain lists and an OutputProfile, and
+    return the encoded image.
+    """
+
+    _executor: Optional[ProcessPoolExecutor] = None
+    _pending = 0
+    cache = GraphCache(GRAPH_CACHE_MAX_BYTES, GRAPH_CACHE_DIR, GRAPH_CACHE_DISK_MAX_BYTES)
+
+    @classmethod
+    def get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            # spawn, forking a process that is running the bot's threads isn't safe.
+            cls._executor = ProcessPoolExecutor(max_workers=MAX_RENDER_WORKERS, mp_context=get_context("spawn"))
+        return cls._executor
+
+    @classmethod
+    async def render(
+        cls, render_fn: Callable[..., bytes], *args: Any, profile: OutputProfile = DEFAULT_PROFILE
+    ) -> bytes:
+        """
+        Returns the cached image if this chart was already drawn from the same data.
+
+        :raises RenderQueueFull: if every worker is busy and the queue is full
+        """
+        key = GraphCache.make_key(render_fn, (*args, profile))
+        image = await cls.cache.get(key, profile.format)
+        if image is not None:
+            return image
+
+        if cls._pending >= MAX_RENDER_WORKERS + MAX_QUEUED_RENDERS:
+            raise RenderQueueFull("Too many graphs are being rendered, try again shortly.")
+        cls._pending += 1
+        try:
+            image = await get_running_loop().run_in_executor(cls.get_executor(), render_fn, *args, profile)
+        finally:
+            cls._pending -= 1
+
+        await cls.cache.put(key, image, profile.format)
+        return image
+
+    @classmethod
+    def shutdown(cls):
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+
+class RankBandTemplate:
+    """
+    The rank bands built once per process: band rectangles and boundary lines
+    in axes-x / data-y coordinates, so each chart adds them as a single
+    collection instead of redrawing ten spans and lines.
+    """
+
+    def __init__(self, bands: List[Tuple[Optional[int], Optional[int], str, str]]):
+        self.bands = [
+            (-_BAND_LIMIT if low is None else low, _BAND_LIMIT if high is None else high, color, rank)
+            for low, high, color, rank in bands
+        ]
+        self.polygons = [[(0, low), (1, low), (1, high), (0, high)] for low, high, _, _ in self.bands]
+        self.lines = [[(0, low), (1, low)] for low, _, _, _ in self.bands if low > -_BAND_LIMIT]
+        self.line_colors = [color for low, _, color, _ in self.bands if low > -_BAND_LIMIT]
+        self.colors = [color for _, _, color, _ in self.bands]
+
+    def _visible(self, ax: Axes) -> Iterator[Tuple[float, float, str, str]]:
+        bottom, top = ax.get_ylim()
+        for low, high, color, rank in self.bands:
+            if high > bottom and low < top:
+                yield max(low, bottom), min(high, top), color, rank
+
+    def fill(self, ax: Axes):
+        """
+        Shades each rank band and labels the visible ones at their middle.
+        Call after the data is plotted, the labels follow the final y limits.
+        """
+        ylim = ax.get_ylim()
+        bands = PolyCollection(
+            self.polygons, facecolors=self.colors, alpha=0.1, linewidths=0,
+            transform=ax.get_yaxis_transform(), zorder=0,
+        )
+        ax.add_collection(bands, autolim=False)
+        for low, high, _, rank in self._visible(ax):
+            ax.text(1, (low + high) / 2, f' {rank}', verticalalignment='center',
+                    transform=ax.get_yaxis_transform())
+        ax.set_ylim(ylim)
+
+    def outline(self, ax: Axes):
+        """
+        Dashed line at the bottom of each rank band, labelled where it is in view.
+        """
+        ylim = ax.get_ylim()
+        lines = LineCollection(
+            self.lines, colors=self.line_colors, alpha=0.2, linestyles='--',
+            transform=ax.get_yaxis_transform(),
+        )
+        ax.add_collection(lines, autolim=False)
+        for low, _, _, rank in self._visible(ax):
+            if low > ylim[0]:
+                ax.text(1, low, f' {rank}', verticalalignment='bottom', transform=ax.get_yaxis_transform())
+        ax.set_ylim(ylim)
+
+
+rank_bands = RankBandTemplate(RANK_BANDS)
+
+
+def _encode_figure(fig: Figure, profile: OutputProfile, dpi: float) -> bytes:
+    buffer = BytesIO()
+    if profile.format == "webp":
+        # Method 2 takes about 60% of the default method's time for files up to a tenth larger.
+        pil_kwargs = {"quality": profile.quality, "method": 2}
+    else:
+        pil_kwargs = {}
+    bbox_inches = 'tight' if profile.tight else None
+    fig.savefig(buffer, format=profile.format, bbox_inches=bbox_inches, dpi=dpi, pil_kwargs=pil_kwargs)
+    return buffer.getvalue()
+
+
+def _layout(fig: Figure, profile: OutputProfile, **margins: float):
+    """
+    Fits the axes around their labels, or applies margins for profiles that aren't tight.
+    """
+    if profile.tight:
+        fig.tight_layout()
+    else:
+        fig.subplots_adjust(**margins)
+
+
+def _save_figure(fig: Figure, profile: OutputProfile) -> bytes:
+    """
+    Encodes the figure for the profile, lowering the dpi until it fits max_bytes.
+    """
+    dpi = profile.dpi
+    image = _encode_figure(fig, profile, dpi)
+    for _ in range(MAX_ENCODE_ATTEMPTS - 1):
+        if len(image) <= profile.max_bytes or dpi <= MIN_DPI:
+            break
+        # Encoded size grows roughly with the pixel count, so with dpi squared.
+        dpi = max(MIN_DPI, dpi * (profile.max_bytes / len(image)) ** 0.5 * 0.9)
+        image = _encode_figure(fig, profile, dpi)
+    return image
+
+
+def render_rating_history(series: List[RatingSeries], profile: OutputProfile = DEFAULT_PROFILE) -> bytes:
+    """
+    Line chart of rating over time, the first series is drawn as the main user.
+    """
+    fig = Figure(figsize=(12, 6))
+    ax = fig.add_subplot()
+
+    # Plot current user's ratings
+    handle, times, ratings = series[0]
+    if ratings:
+        dates = [datetime.fromtimestamp(time) for time in times]
+        ax.plot(dates, ratings, marker='o', label=handle, linewidth=2)
+
+    # Plot other users' ratings
+    colors = colormaps['tab10'](np.linspace(0, 1, len(series) - 1))
+    for (handle, times, ratings), color in zip(series[1:], colors):
+        if ratings:
+            dates = [datetime.fromtimestamp(time) for time in times]
+            ax.plot(dates, ratings, marker='o', label=handle,
+                    linewidth=2, color=color, alpha=0.7)
+
+    # Customize the plot
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Rating', fontsize=12)
+    ax.set_title('Rating Comparison', fontsize=14, pad=20)
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+
+    # Format date axis
+    ax.xaxis.set_major_formatter(DateFormatter('%Y-%m-%d'))
+    fig.autofmt_xdate()  # Rotate and align the tick labels
+
+    # Add subtle background colors for rating ranges
+    rank_bands.fill(ax)
+
+    # Adjust layout to prevent text cutoff
+    _layout(fig, profile, left=0.07, right=0.8, bottom=0.15, top=0.9)
+
+    return _save_figure(fig, profile)
+
+
+def render_rating_bars(
+    handles: List[str], current_ratings: List[int], max_ratings: List[int], profile: OutputProfile = DEFAULT_PROFILE
+) -> bytes:
+    """
+    Grouped bar chart of current and max rating per handle.
+    """
+    fig = Figure(figsize=(12, 6))
+    ax = fig.add_subplot()
+    x = np.arange(len(handles))
+    width = 0.35
+
+    # Create bars
+    current_bars = ax.bar(x - width/2, current_ratings, width,
+                        label='Current Rating', color='royalblue')
+    max_bars = ax.bar(x + width/2, max_ratings, width,
+                    label='Max Rating', color='lightcoral')
+
+    # Customize the plot
+    ax.set_ylabel('Rating', fontsize=12)
+    ax.set_title('Rating Comparison', fontsize=14, pad=20)
+    ax.set_xticks(x, handles, rotation=45, ha='right')
+    ax.legend()
+
+    # Add value labels on the bars
+    ax.bar_label(current_bars, fmt='%d', padding=3)
+    ax.bar_label(max_bars, fmt='%d', padding=3)
+
+    # Add subtle horizontal lines for rating ranges
+    rank_bands.outline(ax)
+
+    # Add grid
+    ax.grid(True, axis='y', linestyle='--', alpha=0.3)
+
+    # Adjust layout
+    _layout(fig, profile, left=0.08, right=0.82, bottom=0.2, top=0.88)
+
+    return _save_figure(fig, profile)
+
+
+def render_verdict_pie(verdict_counts: List[Tuple[str, int]], profile: OutputProfile = DEFAULT_PROFILE) -> bytes:
+    """
+    Pie chart of submission verdicts, verdicts under 1% are grouped into Others.
+    """
+    total = sum(count for _, count in verdict_counts)
+
+    # Define colors for common verdicts
+    verdict_colors = {
+        'OK': '#4CAF50',  # Green for Accepted
+        'WRONG_ANSWER': '#F44336',  # Red for Wrong Answer
+        'TIME_LIMIT_EXCEEDED': '#FFC107',  # Amber for TLE
+        'MEMORY_LIMIT_EXCEEDED': '#FF9800',  # Orange for MLE
+        'RUNTIME_ERROR': '#9C27B0',  # Purple for Runtime Error
+        'COMPILATION_ERROR': '#795548',  # Brown for Compilation Error
+        'FAILED': '#607D8B',  # Blue Grey for Failed
+        'PARTIAL': '#2196F3',  # Blue for Partial
+        'SKIPPED': '#9E9E9E',  # Grey for Skipped
+        'CHALLENGED': '#E91E63',  # Pink for Challenged
+        'REJECTED': '#F44336',  # Red for Rejected
+    }
+
+    # Prepare data for plotting
+    labels = []
+    sizes = []
+    colors = []
+    others = 0
+    others_label = []
+
+    # Sort verdicts by frequency
+    for verdict, count in sorted(verdict_counts, key=lambda x: x[1], reverse=True):
+        # For verdicts with very small counts, group them into "Others"
+        if count / total < 0.01:  # Less than 1%
+            others += count
+            others_label.append(f"{verdict}({count})")
+        else:
+            labels.append(f"{verdict}\n({count})")
+            sizes.append(count)
+            colors.append(verdict_colors.get(verdict, '#9E9E9E'))  # Default to grey if color not defined
+
+    # Add others if any
+    if others > 0:
+        labels.append(f"Others\n({others})\n{', '.join(others_label)}")
+        sizes.append(others)
+        colors.append('#9E9E9E')
+
+    # Create figure
+    fig = Figure(figsize=(10, 8))
+    ax = fig.add_subplot()
+
+    # Create pie chart
+    patches, texts, autotexts = ax.pie(sizes,
+                                    labels=labels,
+                                    colors=colors,
+                                    autopct='%1.1f%%',
+                                    pctdistance=0.85,
+                                    explode=[0.05] * len(sizes))
+
+    # Add title
+    ax.set_title('Submission Verdicts Distribution', pad=20, fontsize=14)
+
+    # Equal aspect ratio ensures that pie is drawn as a circle
+    ax.axis('equal')
+
+    # Add legend with number of total submissions
+    ax.legend(patches, labels,
+            title=f'Total Submissions: {total}',
+            loc='center left',
+            bbox_to_anchor=(1, 0, 0.5, 1))
+
+    # Adjust layout to prevent text cutoff
+    _layout(fig, profile, left=0.02, right=0.76, bottom=0.02, top=0.92)
+
+    return _save_figure(fig, profile)
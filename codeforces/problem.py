@@ -1,17 +1,41 @@
-from typing import Any, Dict, List, Optional, Tuple
-from codeforces.api import problemset_problems
+from sys import intern
+from typing import Any, Dict, List, Optional, Self, Tuple
+from codeforces.api import Priority, problemset_problems, problemset_problems_timed_async
 from utils.discord import BaseEmbed
 
 
+def problem_key(contest_id: Optional[int], problemset_name: Optional[str], index: str) -> str:
+    """
+    Identifies a problem across the problemset, submissions and the database.
+    """
+    return f"{contest_id if contest_id is not None else problemset_name}/{index}"
+
+
 class Problem:
+    ROW_FIELDS = ("contestId", "problemsetName", "index", "name", "type", "rating", "tags")
+
+    __slots__ = ROW_FIELDS
+
+    @classmethod
+    def from_row(cls, row: Tuple[Any, ...]) -> Self:
+        return cls(dict(zip(cls.ROW_FIELDS, row)))
+
     def __init__(self, data: Dict[str, Any]):
         self.contestId: Optional[int] = data.get("contestId", None)
         self.problemsetName: Optional[str] = data.get("problemsetName", None)
-        self.index: str = data["index"]
+        self.index: str = intern(data["index"])
         self.name: str = data["name"]
-        self.type = data["type"]
+        self.type: str = intern(data["type"])
         self.rating: Optional[int] = data.get("rating", None)
-        self.tags: List[str] = data["tags"]
+        # Every problem repeats the same few dozen tag strings, interning shares them.
+        self.tags: Tuple[str, ...] = tuple(intern(tag) for tag in data["tags"])
+
+    @property
+    def key(self) -> str:
+        return problem_key(self.contestId, self.problemsetName, self.index)
+
+    def to_row(self) -> Tuple[Any, ...]:
+        return (self.contestId, self.problemsetName, self.index, self.name, self.type, self.rating, self.tags)
     
     def get_problem_embed(self) -> BaseEmbed:
         embed = BaseEmbed(title=f"{self.index}. {self.name}")
@@ -23,14 +47,37 @@ class Problem:
 
 
 class ProblemStatistics:
+    ROW_FIELDS = ("contestId", "index", "solvedCount")
+
+    __slots__ = ROW_FIELDS
+
+    @classmethod
+    def from_row(cls, row: Tuple[Any, ...]) -> Self:
+        return cls(dict(zip(cls.ROW_FIELDS, row)))
+
     def __init__(self, data: Dict[str, Any]):
         self.contestId: Optional[int] = data.get("contestId", None)
-        self.index: str = data["index"]
+        self.index: str = intern(data["index"])
         self.solvedCount: int = data["solvedCount"]
 
+    def to_row(self) -> Tuple[Any, ...]:
+        return (self.contestId, self.index, self.solvedCount)
+
 
 def get_problems() -> Tuple[List[Problem], List[ProblemStatistics]]:
     problems_data, problems_stats_data = problemset_problems()
     problems = [Problem(problem) for problem in problems_data]
     problems_stats = [ProblemStatistics(stats) for stats in problems_stats_data]
-    return problems, problems_stats
\ No newline at end of file
+    return problems, problems_stats
+
+
+async def get_problems_async(
+    priority: Priority = Priority.BACKGROUND,
+) -> Tuple[List[Problem], List[ProblemStatistics], float]:
+    """
+    :returns: (problems, problems_stats, unix time Codeforces sent them)
+    """
+    problems_data, problems_stats_data, fetched_at = await problemset_problems_timed_async(priority)
+    problems = [Problem(problem) for problem in problems_data]
+    problems_stats = [ProblemStatistics(stats) for stats in problems_stats_data]
+    return problems, problems_stats, fetched_at
\ No newline at end of file
@@ -0,0 +1,177 @@
+from bisect import bisect_left, bisect_right
+from random import Random
+from typing import Container, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from codeforces.problem import Problem, ProblemStatistics, problem_key
+
+_random = Random()
+
+
+class ProblemIndex:
+    """
+    Read-only catalog over a loaded problemset. Every problem gets an ordinal
+    (its position in problems), problems are bucketed by rating and inverted
+    by tag, and solvedCount is joined in by (contestId, index).
+    """
+
+    # Rejection sampling attempts before falling back to a full pass over the candidates.
+    SAMPLE_ATTEMPTS = 32
+
+    def __init__(self, problems: Sequence[Problem], problems_stats: Iterable[ProblemStatistics]):
+        self.problems = problems
+        self._ordinals: Dict[str, int] = {problem.key: i for i, problem in enumerate(problems)}
+
+        self.solved_counts: List[int] = [0] * len(problems)
+        for stats in problems_stats:
+            ordinal = self._ordinals.get(problem_key(stats.contestId, None, stats.index))
+            if ordinal is not None:
+                self.solved_counts[ordinal] = stats.solvedCount
+
+        self._by_rating: Dict[int, List[int]] = {}
+        self._by_tag: Dict[str, Set[int]] = {}
+        for i, problem in enumerate(problems):
+            if problem.rating is not None:
+                self._by_rating.setdefault(problem.rating, []).append(i)
+            for tag in problem.tags:
+                self._by_tag.setdefault(tag, set()).add(i)
+        self._ratings = sorted(self._by_rating)
+
+        # Columnar views for vectorized analytics, 0 stands for unrated.
+        self.rating_array = np.array([problem.rating or 0 for problem in problems], dtype=np.int32)
+        self.tag_matrix = np.zeros((len(self._by_tag), len(problems)), dtype=np.bool_)
+        for row, tag in enumerate(self.tags):
+            self.tag_matrix[row, list(self._by_tag[tag])] = True
+        self._key_ordinals = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.problems)
+
+    @property
+    def tags(self) -> List[str]:
+        return sorted(self._by_tag)
+
+    def ordinal(self, key: str) -> Optional[int]:
+        return self._ordinals.get(key)
+
+    def key_ordinals(self, keys: Sequence[Optional[str]]) -> np.ndarray:
+        """
+        Maps an append-only key table, like a StringTable's values, onto the catalog.
+        Only keys added since the last call are looked up.
+
+        :returns: the ordinal of every key in keys by position, -1 for problems outside the catalog
+        """
+        known, total = len(self._key_ordinals), len(keys)
+        if known < total:
+            added = [-1 if key is None else self._ordinals.get(key, -1) for key in keys[known:total]]
+            self._key_ordinals = np.concatenate((self._key_ordinals, np.array(added, dtype=np.int64)))
+        return self._key_ordinals
+
+    def lookup(self, contest_id: int, index: str) -> Optional[Tuple[Problem, int]]:
+        """
+        :returns: (problem, solvedCount), None if the problem isn't in the problemset
+        """
+        ordinal = self._ordinals.get(problem_key(contest_id, None, index))
+        if ordinal is None:
+            return None
+        return self.problems[ordinal], self.solved_counts[ordinal]
+
+    def _rating_buckets(self, min_rating: Optional[int], max_rating: Optional[int]) -> List[List[int]]:
+        lo = 0 if min_rating is None else bisect_left(self._ratings, min_rating)
+        hi = len(self._ratings) if max_rating is None else bisect_right(self._ratings, max_rating)
+        return [self._by_rating[rating] for rating in self._ratings[lo:hi]]
+
+    def iter_matching(
+        self,
+        min_rating: Optional[int] = None,
+        max_rating: Optional[int] = None,
+        tags: Sequence[str] = (),
+        min_solved: int = 0,
+        exclude: Optional[Container[int]] = None,
+    ) -> Iterator[int]:
+        """
+        Yields the ordinals of problems rated within [min_rating, max_rating]
+        that have every tag in tags, at least min_solved solves and aren't in
+        exclude. Unrated problems only match when no rating bound is given.
+        """
+        tag_sets = [self._by_tag.get(tag, set()) for tag in tags]
+        if any(not tag_set for tag_set in tag_sets):
+            return
+
+        # Walk whichever side is smaller, the rating buckets or the rarest tag, and filter the rest.
+        candidates: Iterable[int]
+        if min_rating is None and max_rating is None and not tag_sets:
+            candidates = range(len(self.problems))
+        elif min_rating is None and max_rating is None:
+            candidates = min(tag_sets, key=len)
+        else:
+            buckets = self._rating_buckets(min_rating, max_rating)
+            rarest = min(tag_sets, key=len, default=None)
+            if rarest is not None and len(rarest) < sum(len(bucket) for bucket in buckets):
+                candidates = rarest
+            else:
+                candidates = (i for bucket in buckets for i in bucket)
+
+        for i in candidates:
+            if not self._matches(i, min_rating, max_rating, tag_sets, min_solved, exclude):
+                continue
+            yield i
+
+    def _matches(
+        self,
+        i: int,
+        min_rating: Optional[int],
+        max_rating: Optional[int],
+        tag_sets: List[Set[int]],
+        min_solved: int,
+        exclude: Optional[Container[int]],
+    ) -> bool:
+        rating = self.problems[i].rating
+        if min_rating is not None or max_rating is not None:
+            if rating is None:
+                return False
+            if min_rating is not None and rating < min_rating:
+                return False
+            if max_rating is not None and rating > max_rating:
+                return False
+        if self.solved_counts[i] < min_solved:
+            return False
+        if exclude is not None and i in exclude:
+            return False
+        return all(i in tag_set for tag_set in tag_sets)
+
+    def sample(
+        self,
+        min_rating: Optional[int] = None,
+        max_rating: Optional[int] = None,
+        tags: Sequence[str] = (),
+        min_solved: int = 0,
+        exclude: Optional[Container[int]] = None,
+        rng: Random = _random,
+    ) -> Optional[Problem]:
+        """
+        Picks a uniformly random problem matching the filters of iter_matching, None if none match.
+        """
+        if min_rating is not None or max_rating is not None:
+            buckets = self._rating_buckets(min_rating, max_rating)
+            total = sum(len(bucket) for bucket in buckets)
+            if total == 0:
+                return None
+
+            tag_sets = [self._by_tag.get(tag, set()) for tag in tags]
+            for _ in range(self.SAMPLE_ATTEMPTS):
+                pick = rng.randrange(total)
+                for bucket in buckets:
+                    if pick < len(bucket):
+                        if self._matches(bucket[pick], min_rating, max_rating, tag_sets, min_solved, exclude):
+                            return self.problems[bucket[pick]]
+                        break
+                    pick -= len(bucket)
+
+        # Sparse filters, reservoir sample a single pass over the candidates.
+        chosen: Optional[int] = None
+        for seen, i in enumerate(self.iter_matching(min_rating, max_rating, tags, min_solved, exclude), start=1):
+            if rng.randrange(seen) == 0:
+                chosen = i
+        return None if chosen is None else self.problems[chosen]
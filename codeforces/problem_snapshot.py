@@ -0,0 +1,87 @@
+from marshal import dumps, loads
+from os import makedirs, replace
+from os.path import dirname
+from struct import Struct, error as StructError
+from time import time
+from typing import List, Optional, Tuple
+from zlib import compress, decompress, error as ZlibError
+from logging import info, warning
+
+from codeforces.problem import Problem, ProblemStatistics
+
+SNAPSHOT_MAGIC = b"CFPS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAX_AGE = 24 * 60 * 60
+
+# magic, format version, unix time the problemset was downloaded
+HEADER = Struct("<4sHd")
+
+
+def read_snapshot_time(path: str) -> Optional[float]:
+    """
+    Reads only the header, so checking for staleness doesn't decode the problemset.
+
+    :returns: the unix time the snapshot was taken, None if there is no usable snapshot
+    """
+    try:
+        with open(path, "rb") as file:
+            magic, version, created_at = HEADER.unpack(file.read(HEADER.size))
+    except (OSError, StructError):
+        return None
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    return created_at
+
+
+def is_snapshot_stale(path: str, max_age: float = SNAPSHOT_MAX_AGE) -> bool:
+    created_at = read_snapshot_time(path)
+    return created_at is None or time() - created_at > max_age
+
+
+def save_snapshot(
+    path: str, problems: List[Problem], problems_stats: List[ProblemStatistics], created_at: Optional[float] = None
+):
+    """
+    :param created_at: unix time the problemset was downloaded, defaults to now
+    """
+    if created_at is None:
+        created_at = time()
+    rows = (
+        tuple(problem.to_row() for problem in problems),
+        tuple(stats.to_row() for stats in problems_stats),
+    )
+    payload = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, created_at) + compress(dumps(rows), 6)
+
+    if dirname(path):
+        makedirs(dirname(path), exist_ok=True)
+    # Written next to the target and renamed over it, so a crash never leaves a half written snapshot.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(payload)
+    replace(tmp_path, path)
+    info(f"Saved problemset snapshot: {len(problems)} problems, {len(payload)} bytes")
+
+
+def load_snapshot(path: str) -> Optional[Tuple[float, List[Problem], List[ProblemStatistics]]]:
+    """
+    :returns: (created_at, problems, problems_stats), None if there is no usable snapshot
+    """
+    try:
+        with open(path, "rb") as file:
+            payload = file.read()
+    except OSError:
+        return None
+
+    try:
+        magic, version, created_at = HEADER.unpack_from(payload)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            warning(f"Ignoring problemset snapshot with unknown format: {path}")
+            return None
+        problem_rows, stats_rows = loads(decompress(payload[HEADER.size:]))
+    except (StructError, ZlibError, ValueError, EOFError, TypeError) as exc:
+        warning(f"Ignoring corrupt problemset snapshot: {path} exc: {exc!r}")
+        return None
+
+    problems = [Problem.from_row(row) for row in problem_rows]
+    problems_stats = [ProblemStatistics.from_row(row) for row in stats_rows]
+    return created_at, problems, problems_stats
@@ -0,0 +1,61 @@
+from typing import Dict, List, Tuple
+
+from codeforces.problem import Problem, ProblemStatistics, problem_key
+from database.database import Database
+
+UPSERT_PROBLEMS_QUERY = (
+    "INSERT INTO problems (problem_key, contest_id, problemset_name, problem_index, name, type, rating) VALUES %s "
+    "ON CONFLICT (problem_key) DO UPDATE SET "
+    "name = EXCLUDED.name,"
+    "type = EXCLUDED.type,"
+    "rating = EXCLUDED.rating"
+)
+INSERT_TAGS_QUERY = "INSERT INTO problem_tags (problem_key, tag) VALUES %s ON CONFLICT DO NOTHING"
+UPSERT_STATS_QUERY = (
+    "INSERT INTO problem_stats (problem_key, solved_count) VALUES %s "
+    "ON CONFLICT (problem_key) DO UPDATE SET solved_count = EXCLUDED.solved_count"
+)
+
+
+def store_problems(problems: List[Problem], problems_stats: List[ProblemStatistics]):
+    """
+    Replaces the stored problemset with this one in one transaction, problems that left
+    the problemset are kept since submissions may still point at them.
+    """
+    problem_rows = {
+        problem.key: (problem.key, problem.contestId, problem.problemsetName, problem.index, problem.name,
+                      problem.type, problem.rating)
+        for problem in problems
+    }
+    tag_rows = {(problem.key, tag) for problem in problems for tag in problem.tags}
+    stats_rows = {
+        key: (key, stats.solvedCount)
+        for stats in problems_stats
+        if (key := problem_key(stats.contestId, None, stats.index)) in problem_rows
+    }
+    with Database.transaction() as cur:
+        Database.execute_values(cur, UPSERT_PROBLEMS_QUERY, list(problem_rows.values()))
+        cur.execute("DELETE FROM problem_tags WHERE problem_key = ANY(%s)", (list(problem_rows),))
+        Database.execute_values(cur, INSERT_TAGS_QUERY, list(tag_rows))
+        Database.execute_values(cur, UPSERT_STATS_QUERY, list(stats_rows.values()))
+
+
+def load_stored_problems() -> Tuple[List[Problem], List[ProblemStatistics]]:
+    """
+    :returns: the stored problemset and the statistics of its problems, newest contests first like the API
+    """
+    tags: Dict[str, List[str]] = {}
+    for key, tag in Database.fetch_many("SELECT problem_key, tag FROM problem_tags ORDER BY problem_key, tag"):
+        tags.setdefault(key, []).append(tag)
+
+    rows = Database.fetch_many(
+        "SELECT p.problem_key, p.contest_id, p.problemset_name, p.problem_index, p.name, p.type, p.rating, "
+        "s.solved_count "
+        "FROM problems p LEFT JOIN problem_stats s ON s.problem_key = p.problem_key "
+        "ORDER BY p.contest_id DESC NULLS LAST, p.problem_index DESC"
+    )
+    problems = [Problem.from_row((*row[1:7], tags.get(row[0], []))) for row in rows]
+    problems_stats = [
+        ProblemStatistics.from_row((row[1], row[3], row[7])) for row in rows if row[7] is not None and row[1] is not None
+    ]
+    return problems, problems_stats
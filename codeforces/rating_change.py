@@ -1,18 +1,62 @@
-from typing import Dict, Any, List, Self
-from codeforces.api import user_rating
+from sys import intern
+from typing import Dict, Any, List, Self, Tuple
+from codeforces.api import Priority, user_rating, user_rating_async
 
 
 class RatingChange:
+    # Column order of the rating_changes table, after handle.
+    ROW_FIELDS = (
+        "contest_id",
+        "contest_name",
+        "rank",
+        "rating_update_time",
+        "old_rating",
+        "new_rating",
+    )
+
+    __slots__ = ("contestId", "contestName", "handle", "rank", "ratingUpdateTimeSeconds", "oldRating", "newRating")
+
     @classmethod
     def get_rating_changes(cls, handle: str) -> List[Self]:
         rating_changes = user_rating(handle)
         return [cls(data) for data in rating_changes]
+
+    @classmethod
+    async def get_rating_changes_async(
+        cls, handle: str, priority: Priority = Priority.INTERACTIVE, fresh: bool = False
+    ) -> List[Self]:
+        rating_changes = await user_rating_async(handle, priority, fresh)
+        return [cls(data) for data in rating_changes]
     
     def __init__(self, data: Dict[str, Any]):
         self.contestId: int = data["contestId"]
-        self.contestName: str = data["contestName"]
-        self.handle: str = data["handle"]
+        # Shared by everyone who took part in the contest.
+        self.contestName: str = intern(data["contestName"])
+        self.handle: str = intern(data["handle"])
         self.rank: int = data["rank"]
         self.ratingUpdateTimeSeconds: int = data["ratingUpdateTimeSeconds"]
         self.oldRating: int = data["oldRating"]
-        self.newRating: int = data["newRating"]
\ No newline at end of file
+        self.newRating: int = data["newRating"]
+
+    @classmethod
+    def from_row(cls, handle: str, row: Tuple[Any, ...]) -> Self:
+        contest_id, contest_name, rank, rating_update_time, old_rating, new_rating = row
+        return cls({
+            "contestId": contest_id,
+            "contestName": contest_name,
+            "handle": handle,
+            "rank": rank,
+            "ratingUpdateTimeSeconds": rating_update_time,
+            "oldRating": old_rating,
+            "newRating": new_rating,
+        })
+
+    def to_row(self) -> Tuple[Any, ...]:
+        return (
+            self.contestId,
+            self.contestName,
+            self.rank,
+            self.ratingUpdateTimeSeconds,
+            self.oldRating,
+            self.newRating,
+        )
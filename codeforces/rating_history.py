@@ -0,0 +1,106 @@
+from asyncio import gather
+from time import time
+from typing import Dict, List, Tuple
+from logging import info, warning
+
+from codeforces.api import CodeforcesAPIError, Priority
+from codeforces.rating_change import RatingChange
+from database.database import Database
+
+# Stored histories newer than this are served as is, ratings only move after a contest.
+RATING_SYNC_INTERVAL = 60 * 60
+
+COLUMNS = ", ".join(RatingChange.ROW_FIELDS)
+UPSERT_RATING_CHANGES_QUERY = (
+    f"INSERT INTO rating_changes (handle, {COLUMNS}) VALUES %s "
+    "ON CONFLICT (handle, contest_id) DO UPDATE SET "
+    "contest_name = EXCLUDED.contest_name,"
+    "rank = EXCLUDED.rank,"
+    "rating_update_time = EXCLUDED.rating_update_time,"
+    "old_rating = EXCLUDED.old_rating,"
+    "new_rating = EXCLUDED.new_rating"
+)
+UPSERT_SYNC_QUERY = (
+    "INSERT INTO rating_sync (handle, synced_at) VALUES %s "
+    "ON CONFLICT (handle) DO UPDATE SET synced_at = EXCLUDED.synced_at"
+)
+
+
+def load_stored_histories(handles: List[str]) -> Dict[str, Tuple[int, List[RatingChange]]]:
+    """
+    :returns: lowercased handle -> (synced_at, rating changes oldest first) for the handles that were synced before
+    """
+    keys = [handle.lower() for handle in handles]
+    names = dict(zip(keys, handles))
+    histories: Dict[str, Tuple[int, List[RatingChange]]] = {}
+    for handle, synced_at in Database.fetch_many(
+        "SELECT handle, synced_at FROM rating_sync WHERE handle = ANY(%s)", keys
+    ):
+        histories[handle] = (synced_at, [])
+
+    rows = Database.fetch_many(
+        f"SELECT handle, {COLUMNS} FROM rating_changes WHERE handle = ANY(%s) ORDER BY handle, rating_update_time",
+        keys,
+    )
+    for row in rows:
+        if row[0] in histories:
+            histories[row[0]][1].append(RatingChange.from_row(names[row[0]], row[1:]))
+    return histories
+
+
+def store_histories(histories: Dict[str, List[RatingChange]]):
+    """
+    Upserts the rating changes of each handle and marks them synced, in one transaction.
+    """
+    now = int(time())
+    rows = [(handle.lower(), *change.to_row()) for handle, changes in histories.items() for change in changes]
+    with Database.transaction() as cur:
+        if rows:
+            Database.execute_values(cur, UPSERT_RATING_CHANGES_QUERY, rows)
+        Database.execute_values(cur, UPSERT_SYNC_QUERY, [(handle.lower(), now) for handle in histories])
+
+
+async def load_rating_histories(
+    handles: List[str], priority: Priority = Priority.INTERACTIVE
+) -> Dict[str, List[RatingChange]]:
+    """
+    Rating histories for a batch of handles. Handles are deduped case
+    insensitively, recently synced ones come from the store and the rest are
+    fetched concurrently, at most one user.rating call per handle.
+
+    :returns: lowercased handle -> rating changes oldest first
+    :raises CodeforcesAPIError: if a handle has to be fetched, fails and was never stored
+    """
+    first_spelling: Dict[str, str] = {}
+    for handle in handles:
+        first_spelling.setdefault(handle.lower(), handle)
+    unique = list(first_spelling.values())
+    stored = await Database.run_async(load_stored_histories, unique)
+    histories = {
+        handle.lower(): stored[handle.lower()][1]
+        for handle in unique
+        if handle.lower() in stored and time() - stored[handle.lower()][0] < RATING_SYNC_INTERVAL
+    }
+
+    # Fetched past the response cache, its stale window is days long and these are stored as synced now.
+    missing = [handle for handle in unique if handle.lower() not in histories]
+    results = await gather(
+        *(RatingChange.get_rating_changes_async(handle, priority, fresh=True) for handle in missing),
+        return_exceptions=True,
+    )
+
+    fetched: Dict[str, List[RatingChange]] = {}
+    for handle, result in zip(missing, results):
+        if isinstance(result, CodeforcesAPIError) and handle.lower() in stored:
+            warning(f"Serving stored rating history for {handle}, fetch failed: {result}")
+            histories[handle.lower()] = stored[handle.lower()][1]
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            fetched[handle] = result
+            histories[handle.lower()] = result
+
+    if fetched:
+        await Database.run_async(store_histories, fetched)
+        info(f"Fetched rating histories for {len(fetched)} of {len(unique)} handles")
+    return histories
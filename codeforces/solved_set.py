@@ -0,0 +1,102 @@
+from time import monotonic
+from typing import Dict, Iterable, Iterator, Self, Tuple
+
+from codeforces.problem_index import ProblemIndex
+from codeforces.submission import Submission
+from database.database import Database
+
+# Cached sets are rebuilt from solved_problems after this many seconds, to
+# pick up solves synced by paths that don't report them here.
+SOLVED_SET_TTL = 30 * 60
+
+
+class SolvedSet:
+    """
+    The problems a handle has solved, as a bitset over ProblemIndex ordinals
+    held in a single int. Problems outside the catalog are ignored.
+    """
+
+    __slots__ = ("bits",)
+
+    def __init__(self, bits: int = 0):
+        self.bits = bits
+
+    @classmethod
+    def from_keys(cls, index: ProblemIndex, keys: Iterable[str]) -> Self:
+        solved = cls()
+        solved.add_keys(index, keys)
+        return solved
+
+    @classmethod
+    def from_submissions(cls, index: ProblemIndex, submissions: Iterable[Submission]) -> Self:
+        return cls.from_keys(index, (sub.problem_key for sub in submissions if sub.verdict == "OK"))
+
+    def add_keys(self, index: ProblemIndex, keys: Iterable[str]) -> int:
+        """
+        :returns: how many of the problems were not in the set yet
+        """
+        before = self.bits
+        for key in keys:
+            ordinal = index.ordinal(key)
+            if ordinal is not None:
+                self.bits |= 1 << ordinal
+        return (self.bits & ~before).bit_count()
+
+    def __contains__(self, ordinal: int) -> bool:
+        return (self.bits >> ordinal) & 1 == 1
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def __iter__(self) -> Iterator[int]:
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    def both(self, other: "SolvedSet") -> "SolvedSet":
+        return SolvedSet(self.bits & other.bits)
+
+    def either(self, other: "SolvedSet") -> "SolvedSet":
+        return SolvedSet(self.bits | other.bits)
+
+    def only(self, other: "SolvedSet") -> "SolvedSet":
+        return SolvedSet(self.bits & ~other.bits)
+
+    def neither(self, other: "SolvedSet", index: ProblemIndex) -> "SolvedSet":
+        return SolvedSet(~(self.bits | other.bits) & ((1 << len(index)) - 1))
+
+
+class SolvedSets:
+    """
+    Per handle SolvedSets for one ProblemIndex. Built from solved_problems on
+    first use and kept current by apply() as syncs report new solves.
+    """
+
+    def __init__(self, index: ProblemIndex):
+        self.index = index
+        self._sets: Dict[str, Tuple[float, SolvedSet]] = {}
+
+    async def get_async(self, handle: str) -> SolvedSet:
+        """
+        The set is built on a Database.run_async worker but only cached here on the
+        event loop, so the dict is never touched from two threads at once.
+        """
+        handle = handle.lower()
+        cached = self._sets.get(handle)
+        if cached is not None and monotonic() - cached[0] < SOLVED_SET_TTL:
+            return cached[1]
+
+        solved = await Database.run_async(self._load, handle)
+        self._sets[handle] = (monotonic(), solved)
+        return solved
+
+    def _load(self, handle: str) -> SolvedSet:
+        rows = Database.fetch_many("SELECT problem_key FROM solved_problems WHERE handle = %s", handle)
+        return SolvedSet.from_keys(self.index, (row[0] for row in rows))
+
+    def apply(self, handle: str, keys: Iterable[str]):
+        cached = self._sets.get(handle.lower())
+        if cached is not None:
+            cached[1].add_keys(self.index, keys)
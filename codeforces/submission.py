@@ -1,24 +1,131 @@
-from typing import Dict, Any, List, Self, Optional
-from codeforces.api import user_status
+from json import dumps
+from sys import intern
+from typing import Dict, Any, Self, Optional, Tuple
+from codeforces.problem import problem_key
 
 
 class Submission:
+    ROW_FIELDS = (
+        "id",
+        "contest_id",
+        "problem_contest_id",
+        "problemset_name",
+        "problem_index",
+        "problem_name",
+        "problem_rating",
+        "creation_time",
+        "relative_time",
+        "programming_language",
+        "verdict",
+        "testset",
+        "passed_test_count",
+        "time_consumed_millis",
+        "memory_consumed_bytes",
+        "points",
+        "problem_tags",
+    )
+
+    __slots__ = (
+        "id",
+        "contest_id",
+        "creationTimeSeconds",
+        "relativeTimeSeconds",
+        "handle",
+        "problem_contest_id",
+        "problemset_name",
+        "problem_index",
+        "problem_name",
+        "problem_rating",
+        "problem_tags",
+        "programmingLanguage",
+        "verdict",
+        "testset",
+        "passedTestCount",
+        "timeConsumedMillis",
+        "memoryConsumedBytes",
+        "points",
+    )
+
     @classmethod
-    def get_rating_changes(cls, handle: str) -> List[Self]:
-        submissions = user_status(handle, count=1000)
-        return [cls(data) for data in submissions]
-    
+    def from_row(cls, handle: str, row: Tuple[Any, ...]) -> Self:
+        submission = cls.__new__(cls)
+        (
+            submission.id, submission.contest_id, submission.problem_contest_id, submission.problemset_name,
+            problem_index, submission.problem_name, submission.problem_rating, submission.creationTimeSeconds,
+            submission.relativeTimeSeconds, programming_language, verdict, testset, submission.passedTestCount,
+            submission.timeConsumedMillis, submission.memoryConsumedBytes, submission.points, problem_tags,
+        ) = row
+        submission.handle = intern(handle)
+        submission.problem_index = intern(problem_index)
+        # NULL for rows stored before tags were, when the problemset had no such problem to fill them from.
+        submission.problem_tags = tuple(intern(tag) for tag in problem_tags or ())
+        submission.programmingLanguage = intern(programming_language)
+        submission.verdict = None if verdict is None else intern(verdict)
+        submission.testset = intern(testset)
+        return submission
+
     def __init__(self, data: Dict[str, Any]):
+        # The nested problem and author objects are flattened, problem and author rebuild them on access.
+        problem = data["problem"]
+        members = data["author"].get("members", [])
         self.id: int = data["id"]
         self.contest_id: Optional[int] = data.get("contestId", None)
         self.creationTimeSeconds: int = data["creationTimeSeconds"]
         self.relativeTimeSeconds: int = data["relativeTimeSeconds"]
-        self.problem = data["problem"]
-        self.author = data["author"]
-        self.programmingLanguage: str = data["programmingLanguage"]
-        self.verdict = data["verdict"]
-        self.testset = data["testset"]
+        self.handle: Optional[str] = intern(members[0]["handle"]) if members else None
+        self.problem_contest_id: Optional[int] = problem.get("contestId", None)
+        self.problemset_name: Optional[str] = problem.get("problemsetName", None)
+        self.problem_index: str = intern(problem["index"])
+        self.problem_name: str = problem["name"]
+        self.problem_rating: Optional[int] = problem.get("rating", None)
+        self.problem_tags: Tuple[str, ...] = tuple(intern(tag) for tag in problem.get("tags", ()))
+        self.programmingLanguage: str = intern(data["programmingLanguage"])
+        verdict = data.get("verdict", None)
+        self.verdict: Optional[str] = None if verdict is None else intern(verdict)
+        self.testset: str = intern(data["testset"])
         self.passedTestCount: int = data["passedTestCount"]
         self.timeConsumedMillis: int = data["timeConsumedMillis"]
         self.memoryConsumedBytes: int = data["memoryConsumedBytes"]
         self.points: Optional[float] = data.get("points", None)
+
+    @property
+    def problem(self) -> Dict[str, Any]:
+        problem: Dict[str, Any] = {
+            "index": self.problem_index, "name": self.problem_name, "tags": list(self.problem_tags)
+        }
+        if self.problem_contest_id is not None:
+            problem["contestId"] = self.problem_contest_id
+        if self.problemset_name is not None:
+            problem["problemsetName"] = self.problemset_name
+        if self.problem_rating is not None:
+            problem["rating"] = self.problem_rating
+        return problem
+
+    @property
+    def author(self) -> Dict[str, Any]:
+        return {"members": [] if self.handle is None else [{"handle": self.handle}]}
+
+    @property
+    def problem_key(self) -> str:
+        return problem_key(self.problem_contest_id, self.problemset_name, self.problem_index)
+
+    def to_row(self) -> Tuple[Any, ...]:
+        return (
+            self.id,
+            self.contest_id,
+            self.problem_contest_id,
+            self.problemset_name,
+            self.problem_index,
+            self.problem_name,
+            self.problem_rating,
+            self.creationTimeSeconds,
+            self.relativeTimeSeconds,
+            self.programmingLanguage,
+            self.verdict,
+            self.testset,
+            self.passedTestCount,
+            self.timeConsumedMillis,
+            self.memoryConsumedBytes,
+            self.points,
+            dumps(self.problem_tags),
+        )
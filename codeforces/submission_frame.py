@@ -0,0 +1,161 @@
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Self, Sequence, Tuple
+
+import numpy as np
+
+from codeforces.problem_index import ProblemIndex
+from codeforces.submission import Submission
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class StringTable:
+    """
+    Interns strings to small int codes. Tables are shared by every frame, so
+    codes mean the same thing across users. Frames are built on Database.run_async
+    workers, new strings are added under a lock and values only ever grows.
+    """
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self._codes: Dict[Optional[str], int] = {}
+        self._lock = Lock()
+
+    def intern(self, value: Optional[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    # Appended before the code is published, so values[code] is always there.
+                    code = len(self.values)
+                    self.values.append(value)
+                    self._codes[value] = code
+        return code
+
+    def code(self, value: Optional[str]) -> int:
+        """
+        :returns: the code of value, -1 if it was never interned
+        """
+        return self._codes.get(value, -1)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+verdicts = StringTable()
+languages = StringTable()
+problem_keys = StringTable()
+
+# (id, creation time, verdict, problem key, language, time consumed, memory consumed)
+FrameRow = Tuple[int, int, Optional[str], str, str, int, int]
+
+
+class SubmissionFrame:
+    """
+    One handle's submissions as parallel NumPy columns, strings are stored as
+    codes into the shared StringTables. Analytics are group-bys over the
+    columns, no per-submission objects are kept. Problems are key codes rather
+    than ordinals, which change with the catalog, and are joined against a
+    ProblemIndex through key_ordinals when a query needs ratings or tags.
+    """
+
+    __slots__ = ("id", "creation_time", "verdict", "problem", "language", "time", "memory")
+
+    def __init__(
+        self,
+        id: np.ndarray,
+        creation_time: np.ndarray,
+        verdict: np.ndarray,
+        problem: np.ndarray,
+        language: np.ndarray,
+        time: np.ndarray,
+        memory: np.ndarray,
+    ):
+        self.id = id
+        self.creation_time = creation_time
+        self.verdict = verdict
+        self.problem = problem
+        self.language = language
+        self.time = time
+        self.memory = memory
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[FrameRow]) -> Self:
+        count = len(rows)
+        return cls(
+            np.fromiter((row[0] for row in rows), dtype=np.int64, count=count),
+            np.fromiter((row[1] for row in rows), dtype=np.int64, count=count),
+            np.fromiter((verdicts.intern(row[2]) for row in rows), dtype=np.int16, count=count),
+            np.fromiter((problem_keys.intern(row[3]) for row in rows), dtype=np.int32, count=count),
+            np.fromiter((languages.intern(row[4]) for row in rows), dtype=np.int16, count=count),
+            np.fromiter((row[5] for row in rows), dtype=np.int32, count=count),
+            np.fromiter((row[6] for row in rows), dtype=np.int64, count=count),
+        )
+
+    @classmethod
+    def from_submissions(cls, submissions: Iterable[Submission]) -> Self:
+        return cls.from_rows([
+            (
+                submission.id,
+                submission.creationTimeSeconds,
+                submission.verdict,
+                submission.problem_key,
+                submission.programmingLanguage,
+                submission.timeConsumedMillis,
+                submission.memoryConsumedBytes,
+            )
+            for submission in submissions
+        ])
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, column).nbytes for column in self.__slots__)
+
+    def verdict_counts(self) -> List[Tuple[str, int]]:
+        """
+        :returns: (verdict, submissions) for every verdict that occurs, pending submissions count as None
+        """
+        counts = np.bincount(self.verdict, minlength=len(verdicts))
+        return [(str(verdicts.values[code]), int(counts[code])) for code in np.flatnonzero(counts)]
+
+    def solved_problems(self) -> np.ndarray:
+        """
+        :returns: the distinct problem key codes with an accepted submission
+        """
+        return np.unique(self.problem[self.verdict == verdicts.code("OK")])
+
+    def solved_ordinals(self, index: ProblemIndex) -> np.ndarray:
+        """
+        :returns: the ProblemIndex ordinals of solved problems, problems outside the catalog are dropped
+        """
+        ordinals = index.key_ordinals(problem_keys.values)[self.solved_problems()]
+        return ordinals[ordinals >= 0]
+
+    def solves_by_rating(self, index: ProblemIndex) -> List[Tuple[int, int]]:
+        """
+        :returns: (rating, distinct problems solved) ascending by rating, unrated problems are left out
+        """
+        ratings = index.rating_array[self.solved_ordinals(index)]
+        values, counts = np.unique(ratings[ratings > 0], return_counts=True)
+        return list(zip(values.tolist(), counts.tolist()))
+
+    def solves_by_tag(self, index: ProblemIndex) -> List[Tuple[str, int]]:
+        """
+        :returns: (tag, distinct problems solved) for tags with at least one solve, most solved first
+        """
+        counts = index.tag_matrix[:, self.solved_ordinals(index)].sum(axis=1)
+        tags = index.tags
+        order = np.argsort(-counts, kind="stable")
+        return [(tags[row], int(counts[row])) for row in order if counts[row] > 0]
+
+    def daily_activity(self, utc_offset: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param utc_offset: seconds added to the timestamps before bucketing into days
+        :returns: (day numbers since the epoch, submissions that day) ascending, for days with any submission
+        """
+        days = (self.creation_time + utc_offset) // SECONDS_PER_DAY
+        return np.unique(days, return_counts=True)
@@ -0,0 +1,163 @@
+from time import time
+from typing import Dict, List, Optional, Tuple
+from logging import info
+
+from codeforces.api import Priority, user_status_page_async
+from codeforces.submission import Submission
+from codeforces.submission_frame import SubmissionFrame
+from database.database import Database
+
+BACKFILL_PAGE_SIZE = 1000
+INCREMENTAL_PAGE_SIZE = 100
+# Handles synced more recently than this are served from the store as is.
+MIN_SYNC_INTERVAL = 5 * 60
+# Submissions still being judged can change verdict, so the high-water mark stays below them.
+PENDING_VERDICTS = {None, "TESTING"}
+
+COLUMNS = ", ".join(Submission.ROW_FIELDS)
+UPSERT_SUBMISSIONS_QUERY = (
+    f"INSERT INTO submissions (handle, {COLUMNS}) VALUES %s "
+    "ON CONFLICT (handle, id) DO UPDATE SET "
+    "verdict = EXCLUDED.verdict,"
+    "testset = EXCLUDED.testset,"
+    "passed_test_count = EXCLUDED.passed_test_count,"
+    "time_consumed_millis = EXCLUDED.time_consumed_millis,"
+    "memory_consumed_bytes = EXCLUDED.memory_consumed_bytes,"
+    "points = EXCLUDED.points,"
+    "problem_tags = EXCLUDED.problem_tags"
+)
+INSERT_SOLVED_QUERY = (
+    "INSERT INTO solved_problems (handle, problem_key, first_solved_at) VALUES %s "
+    "ON CONFLICT (handle, problem_key) DO NOTHING RETURNING problem_key"
+)
+INCREMENT_SOLVED_COUNT_QUERY = (
+    "INSERT INTO solved_counts (handle, solved_count) VALUES (%s, %s) "
+    "ON CONFLICT (handle) DO UPDATE SET solved_count = solved_counts.solved_count + EXCLUDED.solved_count"
+)
+UPSERT_SYNC_QUERY = (
+    "INSERT INTO submission_sync (handle, max_id, synced_at) VALUES (%s, %s, %s) "
+    "ON CONFLICT (handle) DO UPDATE SET max_id = EXCLUDED.max_id, synced_at = EXCLUDED.synced_at"
+)
+
+
+def get_sync_state(handle: str) -> Optional[Tuple[int, int]]:
+    """
+    :returns: (max_id, synced_at) for the handle, None if it was never synced
+    """
+    rows = Database.fetch_many(
+        "SELECT max_id, synced_at FROM submission_sync WHERE handle = %s", handle.lower()
+    )
+    return (rows[0][0], rows[0][1]) if rows else None
+
+
+async def fetch_new_submissions(
+    handle: str, max_id: Optional[int], priority: Priority
+) -> List[Submission]:
+    """
+    Pages through user.status newest first until it reaches max_id, or the
+    oldest submission when max_id is None.
+    """
+    submissions: Dict[int, Submission] = {}
+    page_size = BACKFILL_PAGE_SIZE if max_id is None else INCREMENTAL_PAGE_SIZE
+    from_ = 1
+    while True:
+        page = [Submission(data) for data in await user_status_page_async(handle, from_, page_size, priority)]
+        new = [submission for submission in page if max_id is None or submission.id > max_id]
+        # Pages can overlap if new submissions arrive while paging, keyed by id to drop the repeats.
+        submissions.update((submission.id, submission) for submission in new)
+        if len(page) < page_size or len(new) < len(page):
+            break
+        from_ += page_size
+        page_size = BACKFILL_PAGE_SIZE
+    return list(submissions.values())
+
+
+def store_submissions(handle: str, submissions: List[Submission], max_id: int) -> List[str]:
+    """
+    Upserts the submissions and the new high-water mark, and folds newly
+    solved problems into solved_problems and solved_counts, all in one transaction.
+
+    :returns: the keys of problems the handle solved for the first time
+    """
+    handle = handle.lower()
+
+    first_solves: Dict[str, int] = {}
+    for submission in submissions:
+        if submission.verdict != "OK":
+            continue
+        key = submission.problem_key
+        first_solves[key] = min(first_solves.get(key, submission.creationTimeSeconds), submission.creationTimeSeconds)
+
+    inserted: List[Tuple[str]] = []
+    with Database.transaction() as cur:
+        if submissions:
+            rows = [(handle, *submission.to_row()) for submission in submissions]
+            Database.execute_values(cur, UPSERT_SUBMISSIONS_QUERY, rows)
+        if first_solves:
+            rows = [(handle, key, solved_at) for key, solved_at in first_solves.items()]
+            inserted = Database.execute_values(cur, INSERT_SOLVED_QUERY, rows, fetch=True)
+            cur.execute(INCREMENT_SOLVED_COUNT_QUERY, (handle, len(inserted)))
+        cur.execute(UPSERT_SYNC_QUERY, (handle, max_id, int(time())))
+    return [row[0] for row in inserted]
+
+
+async def sync_submissions(
+    handle: str, priority: Priority = Priority.BACKGROUND, force: bool = False
+) -> List[str]:
+    """
+    Brings the stored submissions of a handle up to date.
+
+    :returns: the keys of problems the handle solved for the first time
+    """
+    state = await Database.run_async(get_sync_state, handle)
+    if state is not None and not force and time() - state[1] < MIN_SYNC_INTERVAL:
+        return []
+
+    max_id = state[0] if state is not None else None
+    submissions = await fetch_new_submissions(handle, max_id, priority)
+
+    pending = [submission.id for submission in submissions if submission.verdict in PENDING_VERDICTS]
+    if pending:
+        new_max_id = min(pending) - 1
+    else:
+        new_max_id = max((submission.id for submission in submissions), default=max_id or 0)
+
+    solved = await Database.run_async(store_submissions, handle, submissions, new_max_id)
+    info(f"Synced {len(submissions)} submissions for {handle}, high-water mark: {new_max_id}")
+    return solved
+
+
+def load_stored_submissions(handle: str) -> List[Submission]:
+    """
+    :returns: the stored submissions of a handle, newest first like user.status
+    """
+    rows = Database.fetch_many(
+        f"SELECT {COLUMNS} FROM submissions WHERE handle = %s ORDER BY id DESC", handle.lower()
+    )
+    return [Submission.from_row(handle, row) for row in rows]
+
+
+def load_stored_frame(handle: str) -> SubmissionFrame:
+    """
+    :returns: the stored submissions of a handle as columns, newest first
+    """
+    rows = Database.fetch_many(
+        "SELECT id, creation_time, verdict, "
+        "COALESCE(CAST(problem_contest_id AS TEXT), problemset_name) || '/' || problem_index, "
+        "programming_language, time_consumed_millis, memory_consumed_bytes "
+        "FROM submissions WHERE handle = %s ORDER BY id DESC",
+        handle.lower(),
+    )
+    return SubmissionFrame.from_rows(rows)
+
+
+def get_solved_leaderboard() -> List[Tuple[str, int]]:
+    """
+    :returns: (handle, distinct problems solved) for every registered user, most solved first
+    """
+    rows = Database.fetch_many(
+        "SELECT users.handle, COALESCE(solved_counts.solved_count, 0) AS solved "
+        "FROM users LEFT JOIN solved_counts ON solved_counts.handle = LOWER(users.handle) "
+        "ORDER BY solved DESC, users.handle"
+    )
+    return [(row[0], row[1]) for row in rows]
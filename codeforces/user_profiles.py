@@ -0,0 +1,36 @@
+from json import dumps
+from time import time
+from typing import Any, Dict, Iterable, List
+
+from codeforces.user import User
+from database.database import Database
+from database.write_buffer import write_buffer
+
+UPSERT_PROFILES_QUERY = (
+    "INSERT INTO user_profiles (handle, data, fetched_at) VALUES %s "
+    "ON CONFLICT (handle) DO UPDATE SET data = EXCLUDED.data, fetched_at = EXCLUDED.fetched_at"
+)
+DELETE_PROFILES_QUERY = "DELETE FROM user_profiles WHERE handle IN (VALUES %s)"
+
+
+def save_profiles(users: Iterable[User]):
+    """
+    Queues the user.info data of each user to be stored, so the next start can serve it before Codeforces answers.
+    """
+    now = int(time())
+    rows = [(user.handle.lower(), dumps(user.to_data()), now) for user in users]
+    write_buffer.enqueue(UPSERT_PROFILES_QUERY, rows, key_size=1)
+
+
+def load_profiles(handles: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    :returns: lowercased handle -> last stored user.info data, for the handles that have any
+    """
+    rows = Database.fetch_many(
+        "SELECT handle, data FROM user_profiles WHERE handle = ANY(%s)", [handle.lower() for handle in handles]
+    )
+    return {row[0]: row[1] for row in rows}
+
+
+def delete_profile(handle: str):
+    write_buffer.enqueue(DELETE_PROFILES_QUERY, [(handle.lower(),)], key_size=1)
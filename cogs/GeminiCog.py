@@ -33,15 +33,16 @@ User Management Commands:
 
 Graph Commands:
 - $rating_graph  
-  Displays the user's rating graph. No arguments required.
+  Displays the user's rating graph. Optional flag: --preview, --standard or --hq.
 - $rating_change_graph  
-  Displays the user's rating change graph. No arguments required.
+  Displays the user's rating change graph. Optional flag: --preview, --standard or --hq.
 - $rating_comparison_graph {handle1} {handle2} ...  
-  Compares the rating graphs of multiple users. Takes multiple arguments: handles.
+  Compares the rating graphs of multiple users. Takes multiple arguments: handles, and optionally --preview, --standard or --hq.
 - $rating_change_comparison_graph {handle1} {handle2} ...  
-  Compares the rating change graphs of multiple users. Takes multiple arguments: handles.
+  Compares the rating change graphs of multiple users. Takes multiple arguments: handles, and optionally --preview, --standard or --hq.
 - $subs_verdict_graph  
-  Displays the user's submissions verdict graph. No arguments required.
+  Displays the user's submissions verdict graph. Optional flag: --preview, --standard or --hq.
+Graphs are drawn at full resolution (--hq) by default. --preview gives a small image that is much faster to draw and --standard sits in between.
 
 Role Management Commands:
 - $assign_roles  
@@ -50,8 +51,10 @@ Role Management Commands:
 Problem Management Commands:
 - $get_problems  
   Loads and displays the count of available problems. No arguments required.
-- $recommend_problem  
-  Recommends a problem based on the user's rating. No arguments required.
+- $recommend_problem {tag1} {tag2} ...  
+  Recommends a problem based on the user's rating. Takes optional arguments: tags, with spaces written as underscores.
+- $solved_stats  
+  Shows the user's solved problems by rating and tag, and their submission activity. No arguments required.
 
 Leaderboard Commands:
 - $leaderboard  
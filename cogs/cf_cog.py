@@ -1,20 +1,46 @@
 from discord.ext import commands, tasks
 from discord.ext.commands import command, Bot, Cog, Context  # type: ignore
 from discord import File
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from io import BytesIO
+from datetime import datetime, timezone
 from logging import info, error as err
 from utils.context_manager import ctx_mgr
 from codeforces.user import User
-from codeforces.problem import Problem, get_problems
+from codeforces.graphs import (
+    DEFAULT_PROFILE,
+    OUTPUT_PROFILES,
+    GraphRenderer,
+    OutputProfile,
+    RenderQueueFull,
+    render_rating_bars,
+    render_rating_history,
+    render_verdict_pie,
+)
+from codeforces.api import Priority, get_api_stats, users_info_async
+from codeforces.problem import Problem, ProblemStatistics, get_problems_async
+from codeforces.submission_sync import sync_submissions, get_solved_leaderboard
+from codeforces.submission_frame import SECONDS_PER_DAY
+from codeforces.problem_index import ProblemIndex
+from codeforces.solved_set import SolvedSets
+from codeforces.problem_snapshot import load_snapshot, save_snapshot, is_snapshot_stale
+from codeforces.problem_store import load_stored_problems, store_problems
+from codeforces.user_profiles import delete_profile, load_profiles, save_profiles
 from utils.discord import send_message, BaseEmbed
-import random
-from asyncio import sleep
+from utils.role_sync import RoleResetJob, RoleSyncReport, sync_guild_roles
+from asyncio import CancelledError, Task, create_task, current_task, to_thread
 from database.database import Database
+from database.write_buffer import write_buffer
+from database.query_stats import QueryStats, format_timing
+from config import PROBLEMSET_SNAPSHOT_PATH
 
 
 class CFCog(Cog):
     users: Dict[int, User] = {}
+    # Registered users whose profile was never fetched, they join users once it is.
+    unloaded: Dict[int, str] = {}
 
+    # Ranks without an id here are matched to a guild role of the same name.
     roles = {
         "newbie": 1302740866724794510,
         "pupil": 1302741628817244270,
@@ -23,18 +49,146 @@ class CFCog(Cog):
     }
 
     problems: List[Problem] = []
+    problems_stats: List[ProblemStatistics] = []
+    problem_index: Optional[ProblemIndex] = None
+    solved_sets: Optional[SolvedSets] = None
+    role_reset: Optional[RoleResetJob] = None
     
     def __init__(self, bot: Bot):
         self.bot = bot
-
-        users = Database.fetch_many("SELECT user_id, handle FROM users")
-        if len(users) > 0:
-            handles = [user[1] for user in users]
-            for i, user in enumerate(User.get_users(handles)):
-                self.users[users[i][0]] = user
-        
+        self.refresh_task: Optional[Task[bool]] = None
+
+    async def cog_load(self):
+        snapshot = await to_thread(load_snapshot, PROBLEMSET_SNAPSHOT_PATH)
+        if snapshot is not None:
+            _, problems, problems_stats = snapshot
+            self.set_problems(problems, problems_stats)
+            info(f"Loaded {len(self.problems)} problems from snapshot.")
+        else:
+            problems, problems_stats = await Database.run_async(load_stored_problems)
+            if problems:
+                self.set_problems(problems, problems_stats)
+                info(f"Loaded {len(self.problems)} problems from the database.")
+        self.refresh_problems.start()
+
+        # Serve the last stored profiles right away, fresh ones are swapped in once Codeforces answers.
+        users = await Database.fetch_many_async("SELECT user_id, handle FROM users")
+        profiles = await Database.run_async(load_profiles, [handle for _, handle in users])
+        for user_id, handle in users:
+            profile = profiles.get(handle.lower())
+            if profile is None:
+                self.unloaded[user_id] = handle
+            else:
+                self.users[user_id] = User(handle, profile)
+        info(f"Loaded {len(profiles)} of {len(users)} user profiles from the database.")
+        self.refresh_task = create_task(self.refresh_users())
+
+        self.sync_all_submissions.start()
+        self.update_users.start()
         info("CF Bot has been loaded.")
 
+    async def cog_unload(self):
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+        self.refresh_problems.cancel()
+        self.sync_all_submissions.cancel()
+        self.update_users.cancel()
+        GraphRenderer.shutdown()
+
+    @staticmethod
+    def split_profile(args: Tuple[str, ...]) -> Tuple[OutputProfile, List[str]]:
+        """
+        Pulls a --preview / --standard / --hq flag out of the command arguments.
+        """
+        profile = DEFAULT_PROFILE
+        rest: List[str] = []
+        for arg in args:
+            if arg.startswith("--") and arg[2:] in OUTPUT_PROFILES:
+                profile = OUTPUT_PROFILES[arg[2:]]
+            else:
+                rest.append(arg)
+        return profile, rest
+
+    async def send_graph(
+        self, title: str, name: str, profile: OutputProfile, render_fn: Callable[..., bytes], *args: Any
+    ):
+        try:
+            image = await GraphRenderer.render(render_fn, *args, profile=profile)
+        except RenderQueueFull:
+            await send_message(content="Too many graphs are being drawn right now, please try again in a bit.")
+            return
+        file = File(BytesIO(image), filename=f"{name}.{profile.format}")
+        embed = BaseEmbed(title=title)
+        await send_message(file=file, embed=embed)
+
+    def set_problems(self, problems: List[Problem], problems_stats: List[ProblemStatistics]):
+        self.problems, self.problems_stats = problems, problems_stats
+        self.problem_index = ProblemIndex(problems, problems_stats)
+        # Ordinals change with the catalog, so the solved sets are rebuilt against the new index.
+        self.solved_sets = SolvedSets(self.problem_index)
+
+    async def load_problems(self, priority: Priority):
+        problems, problems_stats, fetched_at = await get_problems_async(priority)
+        self.set_problems(problems, problems_stats)
+        # Stamped with the download time, a stale cached problemset mustn't look fresh.
+        await to_thread(save_snapshot, PROBLEMSET_SNAPSHOT_PATH, problems, problems_stats, fetched_at)
+        await Database.run_async(store_problems, problems, problems_stats)
+
+    async def refresh_users(self) -> bool:
+        """
+        Fetches every registered user's profile and swaps the fresh User in.
+        A handle that can't be fetched keeps its last profile, or stays unloaded.
+
+        :returns: False if no profile could be fetched at all
+        """
+        registered = [(user_id, user.handle) for user_id, user in self.users.items()]
+        registered += list(self.unloaded.items())
+        if not registered:
+            return True
+        # Past the response cache, a stale profile would be synced to the rank roles for another hour.
+        results = await users_info_async(
+            [handle for _, handle in registered], Priority.BACKGROUND, return_exceptions=True, fresh=True
+        )
+
+        fresh: List[User] = []
+        failed = 0
+        for (user_id, handle), result in zip(registered, results):
+            if isinstance(result, BaseException):
+                err(f"Failed to refresh the profile of {handle}: {result}")
+                failed += 1
+                continue
+            user = User(handle, result)
+            current = self.users.get(user_id)
+            if self.unloaded.get(user_id) == handle:
+                del self.unloaded[user_id]
+            elif current is None or current.handle != handle:
+                # Unregistered or re-registered while the request was in flight.
+                continue
+            self.users[user_id] = user
+            fresh.append(user)
+        save_profiles(fresh)
+        info(f"Refreshed {len(fresh)} of {len(registered)} user profiles.")
+        return failed < len(registered)
+
+    @tasks.loop(minutes=30)
+    async def sync_all_submissions(self):
+        for user in list(self.users.values()):
+            try:
+                solved = await sync_submissions(user.handle, Priority.BACKGROUND)
+                if self.solved_sets is not None:
+                    self.solved_sets.apply(user.handle, solved)
+            except Exception as exc:
+                err(f"Failed to sync submissions for {user.handle}: {exc}", exc_info=True)
+
+    @tasks.loop(hours=1)
+    async def refresh_problems(self):
+        if self.problems and not is_snapshot_stale(PROBLEMSET_SNAPSHOT_PATH):
+            return
+        try:
+            await self.load_problems(Priority.BACKGROUND)
+        except Exception as exc:
+            err(f"Failed to refresh problemset snapshot: {exc}", exc_info=True)
+
     async def cog_command_error(self, ctx: Context[Any], error: Exception) -> None:
         if isinstance(error, commands.CheckFailure):
             return
@@ -57,41 +211,56 @@ class CFCog(Cog):
         await send_message(content="Pong!", embed=embed3)
     
     @staticmethod
-    async def remove_roles(bot: Bot):
-        for guild in bot.guilds:
-            roles = list(CFCog.roles.values())
-            roles = [guild.get_role(role) for role in roles]
-            roles = [role for role in roles if role is not None]
-            for member in guild.members:
-                if member.bot:
-                    continue
-
-                await member.remove_roles(*roles)
+    def remove_roles(bot: Bot, on_progress: Optional[Callable[[str], Awaitable[Any]]] = None) -> Task[None]:
+        """
+        Resets rank roles in the background, registered users keep the role of their own rank.
+        Calling it again while a reset runs returns that reset, after one finished it only
+        picks up members that still hold a stale rank role.
+        """
+        if CFCog.role_reset is None:
+            CFCog.role_reset = RoleResetJob(CFCog.roles)
+        return CFCog.role_reset.start(bot.guilds, CFCog.get_ranks(), on_progress, set(CFCog.unloaded))
     
     @command(name="register")
     async def register(self, ctx: Context[Bot], handle: str):
         ctx_mgr().set_init_context(ctx)
 
-        if ctx.author.id in self.users:
+        if ctx.author.id in self.users or ctx.author.id in self.unloaded:
             await ctx.reply("You are already registered.")
             return
         
-        self.users[ctx.author.id] = User(handle)
-        query = "INSERT INTO users (user_id, handle) VALUES (%s, %s)"
-        Database.execute_query(query, ctx.author.id, handle)
+        user = (await User.get_users_async([handle]))[0]
+        query = "INSERT INTO users (user_id, handle) VALUES %s"
+        try:
+            await write_buffer.write(query, [(ctx.author.id, handle)], immediate=True)
+        except Database.error_type() as exc:
+            err(f"Failed to register {handle} for {ctx.author}: {exc}")
+            await ctx.reply("Registration failed, please try again later.")
+            return
+        self.users[ctx.author.id] = user
+        save_profiles([user])
         await send_message(content="You have been registered!")
     
     @command(name="unregister")
     async def unregister(self, ctx: Context[Bot]):
         ctx_mgr().set_init_context(ctx)
 
-        if ctx.author.id not in self.users:
+        user = self.users.get(ctx.author.id)
+        handle = user.handle if user is not None else self.unloaded.get(ctx.author.id)
+        if handle is None:
             await ctx.reply("You are not registered.")
             return
         
-        del self.users[ctx.author.id]
-        query = "DELETE FROM users WHERE user_id = %s"
-        Database.execute_query(query, ctx.author.id)
+        query = "DELETE FROM users WHERE user_id IN (VALUES %s)"
+        try:
+            await write_buffer.write(query, [(ctx.author.id,)], immediate=True)
+        except Database.error_type() as exc:
+            err(f"Failed to unregister {handle} for {ctx.author}: {exc}")
+            await ctx.reply("Unregistering failed, please try again later.")
+            return
+        self.users.pop(ctx.author.id, None)
+        self.unloaded.pop(ctx.author.id, None)
+        delete_profile(handle)
         await send_message(content="You have been unregistered!")
 
         assert ctx.author is not None
@@ -110,106 +279,136 @@ class CFCog(Cog):
         await send_message(embed=embed)
     
     @command(name="rating_graph")
-    async def rating_graph(self, ctx: Context[Bot]):
+    async def rating_graph(self, ctx: Context[Bot], *args: str):
         ctx_mgr().set_init_context(ctx)
+        profile, _ = self.split_profile(args)
 
         if ctx.author.id not in self.users:
             await ctx.reply("You are not registered.")
             return
 
         user = self.users[ctx.author.id]
-        image = user.get_user_rating_graph()
-        file = File(image, filename="rating_graph.png")
-        embed = BaseEmbed(title="Rating Graph")
-        await send_message(file=file, embed=embed)
+        data = user.get_rating_comparison_data([])
+        await self.send_graph("Rating Graph", "rating_graph", profile, render_rating_bars, *data)
     
     @command(name="rating_change_graph")
-    async def rating_change_graph(self, ctx: Context[Bot]):
+    async def rating_change_graph(self, ctx: Context[Bot], *args: str):
         ctx_mgr().set_init_context(ctx)
+        profile, _ = self.split_profile(args)
 
         if ctx.author.id not in self.users:
             await ctx.reply("You are not registered.")
             return
         
         user = self.users[ctx.author.id]
-        image = user.get_user_rating_change_graph()
-        file = File(image, filename="rating_change_graph.png")
-        embed = BaseEmbed(title="Rating Change Graph")
-        await send_message(file=file, embed=embed)
+        await user.load_rating_changes_async()
+        data = user.get_rating_change_comparison_data([])
+        await self.send_graph("Rating Change Graph", "rating_change_graph", profile, render_rating_history, data)
     
     @command(name="rating_comparison_graph")
     async def rating_comparison_graph(self, ctx: Context[Bot], *args: str):
         ctx_mgr().set_init_context(ctx)
+        profile, handles = self.split_profile(args)
 
         if ctx.author.id not in self.users:
             await ctx.reply("You are not registered.")
             return
         
         user = self.users[ctx.author.id]
-        users = User.get_users(list(args))
-        image = user.get_user_rating_comparison_graph(users)
-        file = File(image, filename="rating_comparison_graph.png")
-        embed = BaseEmbed(title="Rating Comparison Graph")
-        await send_message(file=file, embed=embed)
+        users = await User.get_users_async(handles)
+        data = user.get_rating_comparison_data(users)
+        await self.send_graph("Rating Comparison Graph", "rating_comparison_graph", profile, render_rating_bars, *data)
     
     @command(name="rating_change_comparison_graph")
     async def rating_change_comparison_graph(self, ctx: Context[Bot], *args: str):
         ctx_mgr().set_init_context(ctx)
+        profile, handles = self.split_profile(args)
 
         if ctx.author.id not in self.users:
             await ctx.reply("You are not registered.")
             return
         
         user = self.users[ctx.author.id]
-        users = User.get_users(list(args))
-        image = user.get_user_rating_change_comparison_graph(users)
-        file = File(image, filename="rating_change_comparison_graph.png")
-        embed = BaseEmbed(title="Rating Change Comparison Graph")
-        await send_message(file=file, embed=embed)
+        users = await User.get_users_async(handles)
+        await User.load_rating_histories_async([user] + users)
+        data = user.get_rating_change_comparison_data(users)
+        await self.send_graph(
+            "Rating Change Comparison Graph", "rating_change_comparison_graph", profile, render_rating_history, data
+        )
     
     @command(name="subs_verdict_graph")
-    async def subs_verdict_graph(self, ctx: Context[Bot]):
+    async def subs_verdict_graph(self, ctx: Context[Bot], *args: str):
         ctx_mgr().set_init_context(ctx)
+        profile, _ = self.split_profile(args)
 
         if ctx.author.id not in self.users:
             await ctx.reply("You are not registered.")
             return
         
         user = self.users[ctx.author.id]
-        image = user.get_user_subs_verdict_graph()
-        file = File(image, filename="subs_verdict_graph.png")
-        embed = BaseEmbed(title="Submissions Verdict Graph")
-        await send_message(file=file, embed=embed)
+        await user.load_submission_frame_async()
+        data = user.get_verdict_counts()
+        await self.send_graph("Submissions Verdict Graph", "subs_verdict_graph", profile, render_verdict_pie, data)
     
+    @command(name="solved_stats")
+    async def solved_stats(self, ctx: Context[Bot]):
+        ctx_mgr().set_init_context(ctx)
+
+        if self.problem_index is None:
+            await ctx.reply("Problems not loaded.")
+            return
+
+        if ctx.author.id not in self.users:
+            await ctx.reply("You are not registered.")
+            return
+
+        user = self.users[ctx.author.id]
+        await user.load_submission_frame_async()
+        frame = user.submission_frame
+        assert frame is not None
+        by_rating = frame.solves_by_rating(self.problem_index)
+        by_tag = frame.solves_by_tag(self.problem_index)
+        days, counts = frame.daily_activity()
+
+        embed = BaseEmbed(title=f"{user.handle}'s Solved Stats")
+        embed.add_field(
+            name="By Rating", value="\n".join(f"{rating}: {solved}" for rating, solved in by_rating) or "None"
+        )
+        embed.add_field(name="Top Tags", value="\n".join(f"{tag}: {solved}" for tag, solved in by_tag[:10]) or "None")
+        if len(days):
+            busiest = int(days[counts.argmax()]) * SECONDS_PER_DAY
+            activity = (
+                f"{len(frame)} submissions on {len(days)} days\n"
+                f"Busiest day: {datetime.fromtimestamp(busiest, timezone.utc):%Y-%m-%d} ({counts.max()} submissions)"
+            )
+        else:
+            activity = "No submissions"
+        embed.add_field(name="Activity", value=activity, inline=False)
+        await send_message(embed=embed)
+
     @command(name="assign_roles")
     async def assign_role(self, ctx: Context[Bot]):
         ctx_mgr().set_init_context(ctx)
 
-        for user_id, user in self.users.items():
-            rank = "newbie" if user.rank is None else user.rank
-            role = self.roles[rank]
-            assert ctx.guild is not None
-            role = ctx.guild.get_role(role)
-            user = ctx.guild.get_member(user_id)
-            assert user is not None
-            assert role is not None
-            await user.add_roles(role)
+        assert ctx.guild is not None
+        report = await sync_guild_roles(ctx.guild, self.get_ranks(), self.roles)
+        await send_message(content=f"Rank roles synced: {report}.")
     
     @command(name="get_problems")
     async def get_problems(self, ctx: Context[Bot]):
         ctx_mgr().set_init_context(ctx)
 
-        self.problems, _ = get_problems()
+        await self.load_problems(Priority.INTERACTIVE)
 
         embed = BaseEmbed(title="Loaded Problems")
         embed.add_field(name="Count", value=str(len(self.problems)))
         await send_message(embed=embed)
 
     @command(name="recommend_problem")
-    async def recommend_problem(self, ctx: Context[Bot]):
+    async def recommend_problem(self, ctx: Context[Bot], *tags: str):
         ctx_mgr().set_init_context(ctx)
 
-        if not self.problems:
+        if self.problem_index is None:
             await ctx.reply("Problems not loaded.")
             return
         
@@ -217,16 +416,22 @@ class CFCog(Cog):
             await ctx.reply("You are not registered.")
             return
         
-        rating = self.users[ctx.author.id].rating
+        user = self.users[ctx.author.id]
+        rating = user.rating
         if rating is None:
             rating = 800
         
-        problems = [problem for problem in self.problems if problem.rating is not None and rating + 200 <= problem.rating <= rating + 300]
-        if not problems:
+        assert self.solved_sets is not None
+        problem = self.problem_index.sample(
+            rating + 200,
+            rating + 300,
+            tags=[tag.replace("_", " ") for tag in tags],
+            exclude=await self.solved_sets.get_async(user.handle),
+        )
+        if problem is None:
             await ctx.reply("No problems found.")
             return
 
-        problem = random.choice(problems)
         embed = problem.get_problem_embed()
         await send_message(embed=embed)
 
@@ -236,7 +441,7 @@ class CFCog(Cog):
 
         embed = BaseEmbed(title="Leaderboard")
         users = list(self.users.values())
-        users.sort(key=lambda user: user.rating, reverse=True)  # type: ignore
+        users.sort(key=lambda user: (user.rating is not None, user.rating or 0), reverse=True)
         for i, user in enumerate(users):
             embed.add_field(name=f"{i + 1}. {user.handle}", value=f"Rating: {user.rating}")
         await send_message(embed=embed)
@@ -245,21 +450,9 @@ class CFCog(Cog):
     async def solved_leaderboard(self, ctx: Context[Bot]):
         ctx_mgr().set_init_context(ctx)
 
-        user_solves = {}
-        for _, user in self.users.items():
-            user.load_submissions()
-            user_solves[user.handle] = 0
-            assert user.submissions is not None
-            for submission in user.submissions:
-                if submission.verdict == "OK":
-                    user_solves[user.handle] += 1
-            await sleep(2) 
-
         embed = BaseEmbed(title="Solved Leaderboard")
-        users = list(self.users.values())
-        users.sort(key=lambda user: user_solves[user.handle], reverse=True)  # type: ignore
-        for i, user in enumerate(users):
-            embed.add_field(name=f"{i + 1}. {user.handle}", value=f"Solved: {user_solves[user.handle]}")
+        for i, (handle, solved) in enumerate(await Database.run_async(get_solved_leaderboard)):
+            embed.add_field(name=f"{i + 1}. {handle}", value=f"Solved: {solved}")
         await send_message(embed=embed)
     
     @command(name="max_rating_leaderboard")
@@ -268,27 +461,114 @@ class CFCog(Cog):
 
         embed = BaseEmbed(title="Max Rating Leaderboard")
         users = list(self.users.values())
-        users.sort(key=lambda user: user.maxRating, reverse=True)  # type: ignore
+        users.sort(key=lambda user: (user.maxRating is not None, user.maxRating or 0), reverse=True)
         for i, user in enumerate(users):
             embed.add_field(name=f"{i + 1}. {user.handle}", value=f"Max Rating: {user.maxRating}")
         await send_message(embed=embed)
 
+    @staticmethod
+    def get_ranks() -> Dict[int, str]:
+        """
+        :returns: user id -> rank of every user whose profile is loaded, unrated users are newbies
+        """
+        return {user_id: user.rank or "newbie" for user_id, user in CFCog.users.items()}
+
     @tasks.loop(hours=1)
     async def update_users(self):
-        handles = [user.handle for user in self.users.values()]
-        handles_to_ids = {user.handle: user_id for user_id, user in self.users.items()}
-        for user in User.get_users(handles):
-            self.users[handles_to_ids[user.handle]] = user
-        
-        for user_id, user in self.users.items():
-            rank = "newbie" if user.rank is None else user.rank
-            for guild in self.bot.guilds:
-                role = self.roles[rank]
-                role = guild.get_role(role)
-                user = guild.get_member(user_id)
-                assert user is not None
-                assert role is not None
-                await user.add_roles(role)
+        try:
+            if self.update_users.current_loop == 0 and self.refresh_task is not None:
+                # cog_load already started a refresh, wait for it instead of fetching twice.
+                refreshed = await self.refresh_task
+            else:
+                refreshed = await self.refresh_users()
+        except CancelledError:
+            # cog_unload cancelling the startup refresh, only stop when this loop is the one cancelled.
+            task = current_task()
+            if task is not None and task.cancelling():
+                raise
+            err("The user profile refresh was cancelled.")
+            refreshed = False
+        except Exception as exc:
+            # Escaping here would stop the loop for good.
+            err(f"Failed to refresh user profiles: {exc}", exc_info=True)
+            refreshed = False
+        if not refreshed:
+            err("Skipping the rank role sync, no user profile could be refreshed.")
+            return
+
+        report = RoleSyncReport()
+        for guild in self.bot.guilds:
+            try:
+                report += await sync_guild_roles(guild, self.get_ranks(), self.roles)
+            except Exception as exc:
+                err(f"Failed to sync rank roles in {guild}: {exc}", exc_info=True)
+        info(f"Rank roles synced across {len(self.bot.guilds)} guilds: {report}")
+
+    @update_users.before_loop
+    async def before_update_users(self):
+        # Members and roles are only cached once the bot is ready.
+        await self.bot.wait_until_ready()
+
+    @command(name="db_stats")
+    @commands.has_permissions(administrator=True)
+    async def db_stats(self, ctx: Context[Bot], sort: str = "total", limit: int = 10):
+        """
+        Shows the statements that took the most database time, sort is one of
+        total, mean, max, calls or rows, or reset to clear the counters.
+        """
+        ctx_mgr().set_init_context(ctx)
+
+        if sort == "reset":
+            QueryStats.reset()
+            await send_message(content="Database stats reset.")
+            return
+        if sort not in ("total", "mean", "max", "calls", "rows"):
+            await ctx.reply("Sort by total, mean, max, calls or rows.")
+            return
+
+        statements, calls, rows, reconnects, elapsed = QueryStats.summary()
+        summary = (
+            f"{calls} calls over {statements} statements in {elapsed / 60:.0f} minutes, {rows} rows, "
+            f"{QueryStats.slow_queries} slow, {reconnects} reconnects."
+        )
+        embed = BaseEmbed(title="Database Stats", description=summary)
+        # Embeds hold at most 25 fields.
+        for query, timing in QueryStats.top(min(max(limit, 1), 25), sort):
+            name, value = format_timing(query, timing)
+            embed.add_field(name=name, value=value, inline=False)
+        await send_message(embed=embed)
+
+    @command(name="api_stats")
+    @commands.has_permissions(administrator=True)
+    async def api_stats(self, ctx: Context[Bot]):
+        """
+        Shows the Codeforces call scheduler's lanes and the response cache's hit rates.
+        """
+        ctx_mgr().set_init_context(ctx)
+
+        stats = get_api_stats()
+        cache = stats["cache"]
+        summary = (
+            f"{cache['entries']} cached responses in {cache['bytes'] / 2**20:.1f} of "
+            f"{cache['max_bytes'] / 2**20:.0f}MB, throttled {stats['scheduler']['throttled']} times."
+        )
+        embed = BaseEmbed(title="API Stats", description=summary)
+        for lane, lane_stats in stats["scheduler"]["lanes"].items():
+            value = (
+                f"served {lane_stats['served']}, queued {lane_stats['queued']}\n"
+                f"mean wait {lane_stats['avg_wait']:.2f}s, max wait {lane_stats['max_wait']:.2f}s"
+            )
+            embed.add_field(name=f"{lane.title()} Calls", value=value, inline=False)
+        for endpoint, counts in cache["endpoints"].items():
+            served = counts["hits"] + counts["stale_hits"]
+            lookups = served + counts["misses"]
+            rate = f" ({served / lookups:.0%} from cache)" if lookups else ""
+            value = (
+                f"hits {counts['hits']}, stale hits {counts['stale_hits']}, misses {counts['misses']}{rate}\n"
+                f"refreshes {counts['refreshes']}, evictions {counts['evictions']}"
+            )
+            embed.add_field(name=endpoint, value=value, inline=False)
+        await send_message(embed=embed)
 
     @command(name="help")
     async def help(self, ctx: Context[Bot]):
@@ -297,9 +577,10 @@ class CFCog(Cog):
         embed = BaseEmbed(title="Help")
         embed.add_field(name="General Commands", value="- $ping\nResponds with alternating 'Ping!' and 'Pong!' messages. No arguments required.\n- $query {question}\nQueries the Gemini API with your question and returns a response. Takes one argument: question.\n- $pm\nSends a private message to you asking how the bot can help and you can talk to it. No arguments required.\n- $gemini enable\nEnables Gemini to respond to every message in the server. No arguments required.\n- $gemini disable\nDisables Gemini from responding to every message in the server. No arguments required.\n- $register {name}\nRegisters a new user. Takes the name of the user\n- !help {question}\nTo ask a question related to the commands to the bot. Takes one optional argument: question.")
         embed.add_field(name="User Management Commands", value="- $register {handle}\nRegisters a new user with the specified Codeforces handle. Takes one argument: handle.\n- $unregister\nUnregisters the current user. No arguments required.\n- $get_details\nRetrieves and displays the registered user's details. No arguments required.")
-        embed.add_field(name="Graph Commands", value="- $rating_graph\nDisplays the user's rating graph. No arguments required.\n- $rating_change_graph\nDisplays the user's rating change graph. No arguments required.\n- $rating_comparison_graph {handle1} {handle2} ...\nCompares the rating graphs of multiple users. Takes multiple arguments: handles.\n- $rating_change_comparison_graph {handle1} {handle2} ...\nCompares the rating change graphs of multiple users. Takes multiple arguments: handles.\n- $subs_verdict_graph\nDisplays the user's submissions verdict graph. No arguments required.")
+        embed.add_field(name="Graph Commands", value="- $rating_graph\nDisplays the user's rating graph. Optional flag: --preview, --standard or --hq.\n- $rating_change_graph\nDisplays the user's rating change graph. Optional flag: --preview, --standard or --hq.\n- $rating_comparison_graph {handle1} {handle2} ...\nCompares the rating graphs of multiple users. Takes multiple arguments: handles, and optionally --preview, --standard or --hq.\n- $rating_change_comparison_graph {handle1} {handle2} ...\nCompares the rating change graphs of multiple users. Takes multiple arguments: handles, and optionally --preview, --standard or --hq.\n- $subs_verdict_graph\nDisplays the user's submissions verdict graph. Optional flag: --preview, --standard or --hq.\nGraphs are drawn at full resolution (--hq) by default. --preview gives a small image that is much faster to draw and --standard sits in between.")
         embed.add_field(name="Role Management Commands", value="- $assign_roles\nAssigns roles to users based on their Codeforces rank. No arguments required.")
-        embed.add_field(name="Problem Management Commands", value="- $get_problems\nLoads and displays the count of available problems. No arguments required.\n- $recommend_problem\nRecommends a problem based on the user's rating. No arguments required.")
+        embed.add_field(name="Admin Commands", value="- $db_stats {sort} {limit}\nShows the slowest database statements, for administrators. Takes optional arguments: sort (total, mean, max, calls, rows or reset) and limit.\n- $api_stats\nShows the Codeforces call queues and the response cache hit rates, for administrators. No arguments required.")
+        embed.add_field(name="Problem Management Commands", value="- $get_problems\nLoads and displays the count of available problems. No arguments required.\n- $recommend_problem {tag1} {tag2} ...\nRecommends a problem based on the user's rating. Takes optional arguments: tags, with spaces written as underscores.\n- $solved_stats\nShows the user's solved problems by rating and tag, and their submission activity. No arguments required.")
         embed.add_field(name="Leaderboard Commands", value="- $leaderboard\nDisplays the leaderboard sorted by user ratings. No arguments required.\n- $solved_leaderboard\nDisplays the leaderboard sorted by the number of problems solved. No arguments required.\n- $max_rating_leaderboard\nDisplays the leaderboard sorted by users' maximum ratings. No arguments required.")
         embed.add_field(name="Note", value="Ensure you are registered to use most of the commands. Use $register to register yourself with your Codeforces handle.")
         await send_message(embed=embed)
@@ -6,9 +6,29 @@ load_dotenv()
 DISCORD_API_TOKEN = getenv("DISCORD_API_TOKEN")
 ADMIN_CHANNEL_ID = int(getenv("ADMIN_CHANNEL_ID") or 0)
 
+# postgres, or sqlite for an embedded database file at DB_PATH.
+DB_BACKEND = getenv("DB_BACKEND") or "postgres"
+DB_PATH = getenv("DB_PATH") or "data/bot.sqlite3"
 DB_URL = getenv("DB_URL")
 DB_PORT = getenv("DB_PORT")
 DB_NAME = getenv("DB_NAME")
 DB_USER = getenv("DB_USER")
 DB_PASS = getenv("DB_PASS")
+DB_POOL_MIN = int(getenv("DB_POOL_MIN") or 1)
+DB_POOL_MAX = int(getenv("DB_POOL_MAX") or 8)
+# Milliseconds, applied to every statement unless a call passes its own timeout.
+DB_STATEMENT_TIMEOUT = int(getenv("DB_STATEMENT_TIMEOUT") or 30000)
+# Queued writes are flushed once this many rows are waiting, or this many seconds after the first one.
+DB_WRITE_BATCH_ROWS = int(getenv("DB_WRITE_BATCH_ROWS") or 5000)
+DB_WRITE_FLUSH_INTERVAL = float(getenv("DB_WRITE_FLUSH_INTERVAL") or 1.0)
+# Statements slower than this many milliseconds are logged with their query plan.
+DB_SLOW_QUERY_MS = float(getenv("DB_SLOW_QUERY_MS") or 500)
 Gemini_API_Key = getenv("Gemini_API_Key")
+
+PROBLEMSET_SNAPSHOT_PATH = getenv("PROBLEMSET_SNAPSHOT_PATH") or "data/problemset.snapshot"
+# Rendered graphs are also kept here across restarts when set.
+GRAPH_CACHE_DIR = getenv("GRAPH_CACHE_DIR")
+# Bytes the graph files there may take up, the ones used longest ago are deleted past it.
+GRAPH_CACHE_DISK_MAX_BYTES = int(getenv("GRAPH_CACHE_DISK_MAX_BYTES") or 512 * 1024 * 1024)
+# preview, standard or hq, graph commands can override it with --preview / --standard / --hq.
+GRAPH_PROFILE = getenv("GRAPH_PROFILE") or "hq"
@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Sequence, Tuple, Type
+
+
+class Backend(ABC):
+    """
+    The driver specific half of Database. Queries are written for psycopg2,
+    with %s placeholders, ``= ANY(%s)`` for list parameters and
+    ``INSERT ... VALUES %s`` for execute_values, and a backend that speaks
+    another dialect translates them.
+    """
+
+    # Dialect name, migrations that differ between backends are keyed by it.
+    name: str
+    # Base class of the errors the driver raises.
+    Error: Type[Exception] = Exception
+
+    @abstractmethod
+    def connect(self):
+        ...
+
+    @abstractmethod
+    def close(self):
+        ...
+
+    @abstractmethod
+    def checkout(self, write: bool) -> Any:
+        """
+        :param write: the connection will be used to write, so a backend that locks per database can begin a write transaction up front
+        """
+
+    @abstractmethod
+    def checkin(self, conn: Any):
+        """
+        Returns a connection, rolling back whatever its borrower left uncommitted.
+        """
+
+    @abstractmethod
+    def cursor(self, conn: Any) -> Any:
+        """
+        :returns: a DB-API cursor taking psycopg2 style queries, usable as a context manager
+        """
+
+    @abstractmethod
+    def set_timeout(self, cur: Any, timeout: int):
+        """
+        Limits every following statement on the cursor's transaction to timeout milliseconds.
+        """
+
+    @abstractmethod
+    def execute_values(
+        self, cur: Any, query: str, rows: Sequence[Tuple[Any, ...]], page_size: Optional[int], fetch: bool
+    ) -> List[Tuple[Any, ...]]:
+        ...
+
+    def commit(self, conn: Any):
+        conn.commit()
+
+    def rollback(self, conn: Any):
+        conn.rollback()
+
+    def is_disconnect(self, exc: Exception, conn: Any) -> bool:
+        """
+        :returns: whether exc means the connection was lost, so the statement can be retried on a new one
+        """
+        return False
+
+
+def create_backend(name: str) -> Backend:
+    """
+    Drivers are imported here, so a deployment only needs the one it uses.
+
+    :raises ValueError: if name isn't a known backend
+    """
+    if name == "postgres":
+        from database.postgres import PostgresBackend
+
+        return PostgresBackend()
+    if name == "sqlite":
+        from database.sqlite import SQLiteBackend
+
+        return SQLiteBackend()
+    raise ValueError(f"Unknown database backend: {name}")
@@ -1,5 +1,105 @@
+from typing import Dict, List
+from logging import info
+
 from database.database import Database
 
+SUBMISSION_PARTITIONS = 8
+
+PROBLEM_TABLES = [
+    "CREATE TABLE IF NOT EXISTS problems ("
+    "problem_key TEXT PRIMARY KEY,"
+    "contest_id INT,"
+    "problemset_name TEXT,"
+    "problem_index TEXT NOT NULL,"
+    "name TEXT NOT NULL,"
+    "type TEXT NOT NULL,"
+    "rating INT"
+    ")",
+    "CREATE INDEX IF NOT EXISTS problems_contest_idx ON problems (contest_id, problem_index)",
+    "CREATE INDEX IF NOT EXISTS problems_rating_idx ON problems (rating)",
+    "CREATE TABLE IF NOT EXISTS problem_tags ("
+    "problem_key TEXT NOT NULL REFERENCES problems ON DELETE CASCADE,"
+    "tag TEXT NOT NULL,"
+    "PRIMARY KEY (problem_key, tag)"
+    ")",
+    "CREATE INDEX IF NOT EXISTS problem_tags_tag_idx ON problem_tags (tag)",
+    "CREATE TABLE IF NOT EXISTS problem_stats ("
+    "problem_key TEXT PRIMARY KEY REFERENCES problems ON DELETE CASCADE,"
+    "solved_count INT NOT NULL"
+    ")",
+    "CREATE INDEX IF NOT EXISTS problem_stats_solved_idx ON problem_stats (solved_count DESC)",
+]
+
+# Each entry moves the schema up one version and runs in its own transaction, with the
+# statements for the backend's dialect. Tables that predate versioning are created
+# idempotently by add_tables and count as version 0.
+MIGRATIONS: List[Dict[str, List[str]]] = [
+    # 1: the problemset, its statistics and tags, so problem queries don't need the API
+    {"postgres": PROBLEM_TABLES, "sqlite": PROBLEM_TABLES},
+    # 2: submissions hash partitioned by handle, per handle reads and vacuums only touch one
+    # partition, plus an index for reading a handle's history in time order
+    {
+        "postgres": [
+            "ALTER TABLE submissions RENAME TO submissions_unpartitioned",
+            "CREATE TABLE submissions (LIKE submissions_unpartitioned INCLUDING DEFAULTS) PARTITION BY HASH (handle)",
+            *(
+                f"CREATE TABLE submissions_p{i} PARTITION OF submissions "
+                f"FOR VALUES WITH (MODULUS {SUBMISSION_PARTITIONS}, REMAINDER {i})"
+                for i in range(SUBMISSION_PARTITIONS)
+            ),
+            "INSERT INTO submissions SELECT * FROM submissions_unpartitioned",
+            "DROP TABLE submissions_unpartitioned",
+            "ALTER TABLE submissions ADD PRIMARY KEY (handle, id)",
+            "CREATE INDEX submissions_handle_time_idx ON submissions (handle, creation_time)",
+        ],
+        # SQLite has no partitioning, the (handle, id) primary key already clusters rows by handle.
+        "sqlite": [
+            "CREATE INDEX submissions_handle_time_idx ON submissions (handle, creation_time)",
+        ],
+    },
+    # 3: the problem tags of each submission, stored rows were written without them so they're
+    # filled in from problem_tags where the problemset has the problem
+    {
+        "postgres": [
+            "ALTER TABLE submissions ADD COLUMN problem_tags JSONB",
+            "UPDATE submissions s SET problem_tags = ("
+            "SELECT jsonb_agg(t.tag ORDER BY t.tag) FROM problem_tags t WHERE t.problem_key = "
+            "COALESCE(CAST(s.problem_contest_id AS TEXT), s.problemset_name) || '/' || s.problem_index"
+            ")",
+        ],
+        "sqlite": [
+            "ALTER TABLE submissions ADD COLUMN problem_tags JSONB",
+            "UPDATE submissions SET problem_tags = ("
+            "SELECT json_group_array(tag) FROM ("
+            "SELECT t.tag FROM problem_tags t WHERE t.problem_key = "
+            "COALESCE(CAST(submissions.problem_contest_id AS TEXT), submissions.problemset_name) "
+            "|| '/' || submissions.problem_index ORDER BY t.tag"
+            "))",
+        ],
+    },
+]
+
+
+def migrate():
+    """
+    Applies the migrations newer than the stored schema version.
+    """
+    dialect = Database.dialect()
+    Database.execute_query("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)")
+    for version, statements in enumerate(MIGRATIONS, start=1):
+        with Database.transaction() as cur:
+            # Serializes bots starting against the same database, SQLite's write transaction already does.
+            if dialect == "postgres":
+                cur.execute("LOCK TABLE schema_version IN EXCLUSIVE MODE")
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current = cur.fetchone()[0]  # type: ignore
+            if current >= version:
+                continue
+            for statement in statements[dialect]:
+                cur.execute(statement)
+            cur.execute("INSERT INTO schema_version (version) VALUES (%s)", (version,))
+        info(f"DATABASE: Migrated schema to version {version}")
+
 
 def add_tables():
     query = (
@@ -9,3 +109,103 @@ def add_tables():
         ")"
     )
     Database.execute_query(query)
+
+    query = (
+        "CREATE TABLE IF NOT EXISTS submissions ("
+        "handle TEXT NOT NULL,"
+        "id BIGINT NOT NULL,"
+        "contest_id INT,"
+        "problem_contest_id INT,"
+        "problemset_name TEXT,"
+        "problem_index TEXT NOT NULL,"
+        "problem_name TEXT NOT NULL,"
+        "problem_rating INT,"
+        "creation_time BIGINT NOT NULL,"
+        "relative_time BIGINT,"
+        "programming_language TEXT,"
+        "verdict TEXT,"
+        "testset TEXT,"
+        "passed_test_count INT,"
+        "time_consumed_millis INT,"
+        "memory_consumed_bytes BIGINT,"
+        "points REAL,"
+        "PRIMARY KEY (handle, id)"
+        ")"
+    )
+    Database.execute_query(query)
+
+    query = (
+        "CREATE TABLE IF NOT EXISTS submission_sync ("
+        "handle TEXT PRIMARY KEY,"
+        "max_id BIGINT NOT NULL,"
+        "synced_at BIGINT NOT NULL"
+        ")"
+    )
+    Database.execute_query(query)
+
+    query = (
+        "CREATE TABLE IF NOT EXISTS solved_problems ("
+        "handle TEXT NOT NULL,"
+        "problem_key TEXT NOT NULL,"
+        "first_solved_at BIGINT NOT NULL,"
+        "PRIMARY KEY (handle, problem_key)"
+        ")"
+    )
+    Database.execute_query(query)
+
+    query = (
+        "CREATE TABLE IF NOT EXISTS solved_counts ("
+        "handle TEXT PRIMARY KEY,"
+        "solved_count INT NOT NULL"
+        ")"
+    )
+    Database.execute_query(query)
+    Database.execute_query("CREATE INDEX IF NOT EXISTS solved_counts_count_idx ON solved_counts (solved_count DESC)")
+
+    query = (
+        "CREATE TABLE IF NOT EXISTS rating_changes ("
+        "handle TEXT NOT NULL,"
+        "contest_id INT NOT NULL,"
+        "contest_name TEXT NOT NULL,"
+        "rank INT NOT NULL,"
+        "rating_update_time BIGINT NOT NULL,"
+        "old_rating INT NOT NULL,"
+        "new_rating INT NOT NULL,"
+        "PRIMARY KEY (handle, contest_id)"
+        ")"
+    )
+    Database.execute_query(query)
+
+    query = (
+        "CREATE TABLE IF NOT EXISTS rating_sync ("
+        "handle TEXT PRIMARY KEY,"
+        "synced_at BIGINT NOT NULL"
+        ")"
+    )
+    Database.execute_query(query)
+
+    query = (
+        "CREATE TABLE IF NOT EXISTS user_profiles ("
+        "handle TEXT PRIMARY KEY,"
+        "data JSONB NOT NULL,"
+        "fetched_at BIGINT NOT NULL"
+        ")"
+    )
+    Database.execute_query(query)
+
+    # Fill the materialized tables from submissions that were synced before they existed.
+    query = (
+        "INSERT INTO solved_problems (handle, problem_key, first_solved_at) "
+        "SELECT handle, COALESCE(CAST(problem_contest_id AS TEXT), problemset_name) || '/' || problem_index, MIN(creation_time) "
+        "FROM submissions WHERE verdict = 'OK' AND NOT EXISTS (SELECT 1 FROM solved_counts) "
+        "GROUP BY 1, 2 ON CONFLICT DO NOTHING"
+    )
+    Database.execute_query(query)
+    query = (
+        "INSERT INTO solved_counts (handle, solved_count) "
+        "SELECT handle, COUNT(*) FROM solved_problems WHERE NOT EXISTS (SELECT 1 FROM solved_counts) "
+        "GROUP BY handle"
+    )
+    Database.execute_query(query)
+
+    migrate()
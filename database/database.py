@@ -1,71 +1,175 @@
-import psycopg2
-from psycopg2._psycopg import connection
-from logging import info, error
-from typing import Any, List, Optional, Tuple
+from asyncio import to_thread
+from contextlib import contextmanager
+from logging import error, warning
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple, Type, TypeVar
 
-from config import DB_URL, DB_PORT, DB_NAME, DB_USER, DB_PASS
+from config import DB_BACKEND
+from database.backend import Backend, create_backend
+from database.query_stats import QueryStats
+
+T = TypeVar("T")
+
+# Attempts for a statement whose connection dropped mid query.
+MAX_ATTEMPTS = 2
 
 
 class Database:
 
-    conn: Optional[connection] = None
+    backend: Optional[Backend] = None
 
     @staticmethod
     def establish_connection():
-        Database.conn = psycopg2.connect(
-            host=DB_URL,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-        )
-        info("DATABASE: Connection established")
+        """
+        :raises ValueError: if DB_BACKEND isn't a known backend
+        """
+        Database.backend = create_backend(DB_BACKEND)
+        Database.backend.connect()
 
     @staticmethod
     def terminate_connection():
-        assert Database.conn is not None
-        Database.conn.close()
-        info("DATABASE: Connection terminated")
+        assert Database.backend is not None
+        Database.backend.close()
+        Database.backend = None
+
+    @staticmethod
+    def dialect() -> str:
+        assert Database.backend is not None
+        return Database.backend.name
 
     @staticmethod
-    def get_connection():
-        assert Database.conn is not None
-        return Database.conn
+    def error_type() -> Type[Exception]:
+        """
+        :returns: the base class of the errors the backend raises
+        """
+        assert Database.backend is not None
+        return Database.backend.Error
 
     @staticmethod
-    def get_cursor():
-        return Database.get_connection().cursor()
+    @contextmanager
+    def connection(write: bool = False) -> Iterator[Any]:
+        """
+        Borrows a connection from the backend for the duration of the block.
+        """
+        assert Database.backend is not None
+        backend = Database.backend
+        conn = backend.checkout(write)
+        try:
+            yield conn
+        finally:
+            backend.checkin(conn)
 
     @staticmethod
-    def commit():
-        conn = Database.get_connection()
-        conn.commit()
+    def _run(work: Callable[[Any], T], timeout: Optional[int] = None, commit: bool = False) -> T:
+        """
+        Runs work on a pooled cursor, retrying on a fresh connection if the
+        old one dropped. Timeouts and query errors aren't retried.
+
+        :param timeout: statement timeout in milliseconds for this call only
+        """
+        assert Database.backend is not None
+        backend = Database.backend
+        attempt = 1
+        while True:
+            with Database.connection(write=commit) as conn:
+                try:
+                    with backend.cursor(conn) as cur:
+                        if timeout is not None:
+                            backend.set_timeout(cur, timeout)
+                        result = work(cur)
+                    if commit:
+                        backend.commit(conn)
+                    return result
+                except Exception as exc:
+                    if not backend.is_disconnect(exc, conn) or attempt == MAX_ATTEMPTS:
+                        raise
+                    warning(f"DATABASE: Connection dropped, retrying (attempt {attempt + 1}/{MAX_ATTEMPTS})")
+                    QueryStats.record_reconnect()
+            attempt += 1
 
     @staticmethod
-    def execute_query(query: str, *args: Any):
+    def execute_query(query: str, *args: Any, timeout: Optional[int] = None):
         try:
-            with Database.get_cursor() as cur:
-                cur.execute(query, args)
-            Database.commit()
+            Database._run(lambda cur: cur.execute(query, args), timeout, commit=True)
         except Exception as exc:
-            Database.establish_connection()
             error(f"exc: {exc}\nquery: {query}\nargs: {args}", exc_info=True)
+            raise
+
+    @staticmethod
+    @contextmanager
+    def transaction(timeout: Optional[int] = None) -> Iterator[Any]:
+        """
+        Yields a cursor on a pooled connection, commits when the block exits and rolls back if it raises.
+
+        :param timeout: statement timeout in milliseconds for each statement in the block
+        """
+        assert Database.backend is not None
+        backend = Database.backend
+        with Database.connection(write=True) as conn:
+            try:
+                with backend.cursor(conn) as cur:
+                    if timeout is not None:
+                        backend.set_timeout(cur, timeout)
+                    yield cur
+                backend.commit(conn)
+            except Exception:
+                backend.rollback(conn)
+                raise
 
     @staticmethod
-    def fetch_many(query: str, *args: Any) -> List[Tuple[Any, ...]]:
-        with Database.get_cursor() as cur:
+    def execute_values(
+        cur: Any, query: str, rows: Sequence[Tuple[Any, ...]], page_size: Optional[int] = None, fetch: bool = False
+    ) -> List[Tuple[Any, ...]]:
+        """
+        Runs a multi-row ``INSERT ... VALUES %s`` with up to page_size rows per statement,
+        all of them in one statement by default.
+
+        :returns: the rows returned by a RETURNING clause if fetch is set
+        """
+        assert Database.backend is not None
+        if not rows:
+            return []
+        return Database.backend.execute_values(cur, query, rows, page_size, fetch)
+
+    @staticmethod
+    def fetch_many(query: str, *args: Any, timeout: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        def work(cur: Any) -> List[Tuple[Any, ...]]:
             cur.execute(query, args)
-            result = cur.fetchall()
-            return result
+            return cur.fetchall()
+
+        return Database._run(work, timeout)
 
     @staticmethod
-    def fetch_one(query: str, *args: Any) -> Tuple[Any, ...]:
+    def fetch_one(query: str, *args: Any, timeout: Optional[int] = None) -> Tuple[Any, ...]:
         """
         :raises ValueError: if no result is found
         """
-        with Database.get_cursor() as cur:
+        def work(cur: Any) -> Optional[Tuple[Any, ...]]:
             cur.execute(query, args)
-            result = cur.fetchone()
-            if result is None:
-                raise ValueError("No result found")
-            return result
+            return cur.fetchone()
+
+        result = Database._run(work, timeout)
+        if result is None:
+            raise ValueError("No result found")
+        return result
+
+    @staticmethod
+    async def run_async(fn: Callable[..., T], *args: Any) -> T:
+        """
+        Runs a blocking database function in a worker thread, each call borrows its own pooled connection.
+        """
+        return await to_thread(fn, *args)
+
+    @staticmethod
+    async def execute_query_async(query: str, *args: Any, timeout: Optional[int] = None):
+        await to_thread(Database.execute_query, query, *args, timeout=timeout)
+
+    @staticmethod
+    async def fetch_many_async(query: str, *args: Any, timeout: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        return await to_thread(Database.fetch_many, query, *args, timeout=timeout)
+
+    @staticmethod
+    async def fetch_one_async(query: str, *args: Any, timeout: Optional[int] = None) -> Tuple[Any, ...]:
+        """
+        :raises ValueError: if no result is found
+        """
+        return await to_thread(Database.fetch_one, query, *args, timeout=timeout)
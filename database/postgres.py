@@ -0,0 +1,180 @@
+import psycopg2
+from psycopg2._psycopg import connection, cursor
+from psycopg2.extensions import STATUS_READY
+from psycopg2.extras import execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from logging import info, warning
+from threading import Lock, Semaphore
+from time import monotonic, perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from config import (
+    DB_URL,
+    DB_PORT,
+    DB_NAME,
+    DB_USER,
+    DB_PASS,
+    DB_POOL_MIN,
+    DB_POOL_MAX,
+    DB_STATEMENT_TIMEOUT,
+    DB_SLOW_QUERY_MS,
+)
+from database.backend import Backend
+from database.query_stats import QueryStats
+
+# Seconds to wait for a free connection before giving up.
+POOL_TIMEOUT = 30
+# Connections idle longer than this are pinged before being handed out.
+HEALTH_CHECK_IDLE = 60
+
+
+class TimedCursor(cursor):
+    """
+    Records every statement in QueryStats and logs the plan of slow ones.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # Statement the stats are keyed by instead of the text sent, set while execute_values runs.
+        self.template: Optional[str] = None
+
+    def execute(self, query: Union[str, bytes], vars: Any = None):  # type: ignore
+        label = self.template or (query.decode() if isinstance(query, bytes) else query)
+        start = perf_counter()
+        try:
+            super().execute(query, vars)
+        except Exception:
+            QueryStats.record(label, (perf_counter() - start) * 1000, 0, failed=True)
+            raise
+        elapsed_ms = (perf_counter() - start) * 1000
+        QueryStats.record(label, elapsed_ms, self.rowcount)
+        if elapsed_ms >= DB_SLOW_QUERY_MS and QueryStats.should_explain(label):
+            self._log_plan(label, query, vars, elapsed_ms)
+
+    def _log_plan(self, label: str, query: Union[str, bytes], vars: Any, elapsed_ms: float):
+        # A plain cursor so the plan isn't recorded and this cursor's results stay intact,
+        # under a savepoint so a failed EXPLAIN doesn't abort the caller's transaction.
+        explain = f"EXPLAIN {query.decode() if isinstance(query, bytes) else query}"
+        with cursor(self.connection) as cur:
+            try:
+                cur.execute("SAVEPOINT explain_slow_query")
+                cur.execute(explain, vars)
+                plan = "\n".join(row[0] for row in cur.fetchall())
+                cur.execute("RELEASE SAVEPOINT explain_slow_query")
+            except psycopg2.Error as exc:
+                cur.execute("ROLLBACK TO SAVEPOINT explain_slow_query")
+                plan = f"EXPLAIN failed: {exc}"
+        warning(f"DATABASE: Slow query took {elapsed_ms:.0f}ms\nquery: {label}\n{plan}")
+
+
+class PostgresBackend(Backend):
+    """
+    A remote Postgres server behind a thread safe connection pool.
+    """
+
+    name = "postgres"
+    Error = psycopg2.Error
+
+    def __init__(self):
+        self.pool: Optional[ThreadedConnectionPool] = None
+        # getconn raises on an exhausted pool, callers queue here instead.
+        self._slots = Semaphore(DB_POOL_MAX)
+        self._last_used: Dict[int, float] = {}
+        self._last_used_lock = Lock()
+
+    def connect(self):
+        self.pool = ThreadedConnectionPool(
+            DB_POOL_MIN,
+            DB_POOL_MAX,
+            host=DB_URL,
+            port=DB_PORT,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASS,
+            options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT}",
+            cursor_factory=TimedCursor,
+        )
+        info(f"DATABASE: Connection pool established ({DB_POOL_MIN}-{DB_POOL_MAX} connections)")
+
+    def close(self):
+        assert self.pool is not None
+        self.pool.closeall()
+        self.pool = None
+        info("DATABASE: Connection pool terminated")
+
+    def _is_healthy(self, conn: connection) -> bool:
+        if conn.closed:
+            return False
+        with self._last_used_lock:
+            last_used = self._last_used.get(id(conn))
+        # Connections the pool just opened have no history and don't need a ping.
+        if last_used is None or monotonic() - last_used < HEALTH_CHECK_IDLE:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def checkout(self, write: bool) -> connection:
+        """
+        :raises PoolError: if no connection frees up within POOL_TIMEOUT
+        """
+        assert self.pool is not None
+        if not self._slots.acquire(timeout=POOL_TIMEOUT):
+            raise PoolError(f"No database connection available after {POOL_TIMEOUT}s")
+        try:
+            conn = self.pool.getconn()
+            while not self._is_healthy(conn):
+                warning("DATABASE: Replacing a broken pooled connection")
+                QueryStats.record_reconnect()
+                with self._last_used_lock:
+                    self._last_used.pop(id(conn), None)
+                self.pool.putconn(conn, close=True)
+                conn = self.pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def checkin(self, conn: connection):
+        assert self.pool is not None
+        try:
+            if not conn.closed and conn.status != STATUS_READY:
+                # Reads leave a transaction open, don't hand it to the next caller.
+                conn.rollback()
+        except psycopg2.Error:
+            pass
+        with self._last_used_lock:
+            if conn.closed:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = monotonic()
+        self.pool.putconn(conn, close=bool(conn.closed))
+        self._slots.release()
+
+    def cursor(self, conn: connection) -> cursor:
+        return conn.cursor()
+
+    def set_timeout(self, cur: cursor, timeout: int):
+        cur.execute("SET LOCAL statement_timeout = %s", (timeout,))
+
+    def execute_values(
+        self, cur: cursor, query: str, rows: Sequence[Tuple[Any, ...]], page_size: Optional[int], fetch: bool
+    ) -> List[Tuple[Any, ...]]:
+        if isinstance(cur, TimedCursor):
+            cur.template = query
+        try:
+            return execute_values(cur, query, rows, page_size=page_size or len(rows), fetch=fetch) or []
+        finally:
+            if isinstance(cur, TimedCursor):
+                cur.template = None
+
+    def rollback(self, conn: connection):
+        if not conn.closed:
+            conn.rollback()
+
+    def is_disconnect(self, exc: Exception, conn: connection) -> bool:
+        return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError)) and bool(conn.closed)
@@ -0,0 +1,153 @@
+from bisect import bisect_left
+from functools import lru_cache
+from re import compile
+from threading import Lock
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds of the latency buckets in milliseconds, the last bucket takes everything slower.
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# A slow statement is explained at most this often, so a hot slow query doesn't double its own load.
+EXPLAIN_INTERVAL = 10 * 60
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+_STRING_LITERAL = compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_WHITESPACE = compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_query(query: str) -> str:
+    """
+    Collapses whitespace and replaces literals with ?, so statements that only differ
+    in their values share one entry.
+    """
+    query = _STRING_LITERAL.sub("?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class QueryTiming:
+    __slots__ = ("calls", "errors", "rows", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    def percentile_ms(self, fraction: float) -> float:
+        """
+        :returns: the upper bound of the bucket holding the given fraction of calls, capped at the slowest call
+        """
+        target = fraction * self.calls
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(float(bound), self.max_ms)
+        return self.max_ms
+
+
+class QueryStats:
+    """
+    Per statement timings keyed by normalized query text, plus connection counters.
+    Recorded from the pool's worker threads, so every update takes the lock.
+    """
+
+    _lock = Lock()
+    timings: Dict[str, QueryTiming] = {}
+    reconnects = 0
+    slow_queries = 0
+    since = monotonic()
+    _explained_at: Dict[str, float] = {}
+
+    @staticmethod
+    def record(query: str, elapsed_ms: float, rows: int, failed: bool = False):
+        key = normalize_query(query)
+        with QueryStats._lock:
+            timing = QueryStats.timings.get(key)
+            if timing is None:
+                timing = QueryStats.timings[key] = QueryTiming()
+            timing.calls += 1
+            timing.errors += failed
+            timing.rows += max(rows, 0)
+            timing.total_ms += elapsed_ms
+            timing.max_ms = max(timing.max_ms, elapsed_ms)
+            timing.buckets[bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+
+    @staticmethod
+    def record_reconnect():
+        with QueryStats._lock:
+            QueryStats.reconnects += 1
+
+    @staticmethod
+    def should_explain(query: str) -> bool:
+        """
+        Counts a slow statement and decides whether its plan should be logged.
+        """
+        key = normalize_query(query)
+        now = monotonic()
+        with QueryStats._lock:
+            QueryStats.slow_queries += 1
+            if not key.upper().startswith(EXPLAINABLE):
+                return False
+            if now - QueryStats._explained_at.get(key, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+                return False
+            QueryStats._explained_at[key] = now
+            return True
+
+    @staticmethod
+    def top(limit: int = 10, sort: str = "total") -> List[Tuple[str, QueryTiming]]:
+        """
+        :param sort: total, mean, max, calls or rows
+        """
+        keys = {
+            "total": lambda item: item[1].total_ms,
+            "mean": lambda item: item[1].mean_ms,
+            "max": lambda item: item[1].max_ms,
+            "calls": lambda item: item[1].calls,
+            "rows": lambda item: item[1].rows,
+        }
+        with QueryStats._lock:
+            items = list(QueryStats.timings.items())
+        return sorted(items, key=keys[sort], reverse=True)[:limit]
+
+    @staticmethod
+    def reset():
+        with QueryStats._lock:
+            QueryStats.timings = {}
+            QueryStats.reconnects = 0
+            QueryStats.slow_queries = 0
+            QueryStats.since = monotonic()
+            QueryStats._explained_at = {}
+
+    @staticmethod
+    def summary() -> Tuple[int, int, int, int, float]:
+        """
+        :returns: (statements, calls, rows, reconnects, seconds since the counters started)
+        """
+        with QueryStats._lock:
+            calls = sum(timing.calls for timing in QueryStats.timings.values())
+            rows = sum(timing.rows for timing in QueryStats.timings.values())
+            return len(QueryStats.timings), calls, rows, QueryStats.reconnects, monotonic() - QueryStats.since
+
+
+def format_timing(query: str, timing: QueryTiming, max_query_length: Optional[int] = 200) -> Tuple[str, str]:
+    """
+    :returns: (title, details) for showing a statement's timings in an embed field
+    """
+    if max_query_length is not None and len(query) > max_query_length:
+        query = query[: max_query_length - 3] + "..."
+    details = (
+        f"calls {timing.calls}, errors {timing.errors}, rows {timing.rows}\n"
+        f"total {timing.total_ms:.0f}ms, mean {timing.mean_ms:.1f}ms, "
+        f"p50 {timing.percentile_ms(0.5):.0f}ms, p95 {timing.percentile_ms(0.95):.0f}ms, max {timing.max_ms:.0f}ms"
+    )
+    return query, details
@@ -0,0 +1,240 @@
+import sqlite3
+from functools import lru_cache
+from json import loads
+from logging import info, warning
+from os import makedirs
+from os.path import dirname
+from re import compile
+from threading import Lock, local
+from time import monotonic, perf_counter
+from typing import Any, List, Optional, Sequence, Tuple
+
+from config import DB_PATH, DB_STATEMENT_TIMEOUT, DB_SLOW_QUERY_MS
+from database.backend import Backend
+from database.query_stats import QueryStats
+
+# Milliseconds a writer waits for another connection's write lock.
+BUSY_TIMEOUT = 5000
+# Prepared statements each connection keeps for reuse.
+STATEMENT_CACHE_SIZE = 256
+# SQLite checks the statement timeout every this many virtual machine steps.
+PROGRESS_STEPS = 10000
+
+_PLACEHOLDER = compile(r"=\s*ANY\(%s\)|%s|%%")
+
+# JSONB columns hold JSON text here, they're decoded on the way out like psycopg2 does.
+sqlite3.register_converter("JSONB", loads)
+
+
+@lru_cache(maxsize=512)
+def _parse(query: str) -> Tuple[Tuple[str, ...], Tuple[bool, ...]]:
+    """
+    Splits a psycopg2 style query around its placeholders.
+
+    :returns: (the text around the placeholders, whether each placeholder is a list compared with = ANY)
+    """
+    pieces: List[str] = []
+    lists: List[bool] = []
+    current = ""
+    position = 0
+    for match in _PLACEHOLDER.finditer(query):
+        current += query[position : match.start()]
+        position = match.end()
+        if match.group() == "%%":
+            current += "%"
+            continue
+        pieces.append(current)
+        lists.append(match.group() != "%s")
+        current = ""
+    pieces.append(current + query[position:])
+    return tuple(pieces), tuple(lists)
+
+
+def translate(query: str, params: Optional[Sequence[Any]]) -> Tuple[str, Sequence[Any]]:
+    """
+    Rewrites a psycopg2 style query for sqlite3: %s becomes ?, ``= ANY(%s)`` becomes
+    ``IN (?, ...)`` with the list spread into the parameters, and %% becomes %.
+    Like psycopg2, a query without parameters is passed through untouched.
+    """
+    if params is None:
+        return query, ()
+    pieces, lists = _parse(query)
+    if not any(lists):
+        return "?".join(pieces), params
+    sql = [pieces[0]]
+    flat: List[Any] = []
+    for piece, is_list, value in zip(pieces[1:], lists, params):
+        if is_list:
+            sql.append(f" IN ({', '.join('?' * len(value))})")
+            flat.extend(value)
+        else:
+            sql.append("?")
+            flat.append(value)
+        sql.append(piece)
+    return "".join(sql), flat
+
+
+@lru_cache(maxsize=128)
+def translate_values(query: str, width: int) -> str:
+    """
+    Rewrites an ``INSERT ... VALUES %s`` query into a single row statement for executemany.
+    """
+    pieces, _ = _parse(query)
+    return f"{pieces[0]}({', '.join('?' * width)}){pieces[1]}"
+
+
+class SQLiteCursor:
+    """
+    A sqlite3 cursor taking psycopg2 style queries. Result rows are read while
+    the statement is timed, the way psycopg2 fetches them on execute, and every
+    statement is recorded in QueryStats.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.connection = conn
+        self.timeout = DB_STATEMENT_TIMEOUT
+        self.rowcount = -1
+        self.description: Any = None
+        self._cursor = conn.cursor()
+        self._rows: List[Tuple[Any, ...]] = []
+        self._next = 0
+
+    def __enter__(self) -> "SQLiteCursor":
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        self.close()
+
+    def close(self):
+        self._cursor.close()
+
+    def execute(self, query: str, vars: Optional[Sequence[Any]] = None):
+        sql, params = translate(query, vars)
+        self._execute(query, sql, params)
+
+    def _execute(self, label: str, sql: str, params: Sequence[Any], many: bool = False):
+        deadline = monotonic() + self.timeout / 1000
+        self.connection.set_progress_handler(lambda: monotonic() > deadline, PROGRESS_STEPS)
+        start = perf_counter()
+        try:
+            if many:
+                self._cursor.executemany(sql, params)
+            else:
+                self._cursor.execute(sql, params)
+            self.description = self._cursor.description
+            self._rows = self._cursor.fetchall() if self.description is not None else []
+            self._next = 0
+        except Exception:
+            QueryStats.record(label, (perf_counter() - start) * 1000, 0, failed=True)
+            raise
+        finally:
+            self.connection.set_progress_handler(None, 0)
+        elapsed_ms = (perf_counter() - start) * 1000
+        self.rowcount = len(self._rows) if self.description is not None else self._cursor.rowcount
+        QueryStats.record(label, elapsed_ms, self.rowcount)
+        if elapsed_ms >= DB_SLOW_QUERY_MS and QueryStats.should_explain(label):
+            self._log_plan(label, sql, params[0] if many and params else params, elapsed_ms)
+
+    def _log_plan(self, label: str, sql: str, params: Sequence[Any], elapsed_ms: float):
+        try:
+            steps = self.connection.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            plan = "\n".join(step[-1] for step in steps)
+        except sqlite3.Error as exc:
+            plan = f"EXPLAIN failed: {exc}"
+        warning(f"DATABASE: Slow query took {elapsed_ms:.0f}ms\nquery: {label}\n{plan}")
+
+    def fetchone(self) -> Optional[Tuple[Any, ...]]:
+        if self._next >= len(self._rows):
+            return None
+        self._next += 1
+        return self._rows[self._next - 1]
+
+    def fetchall(self) -> List[Tuple[Any, ...]]:
+        rows = self._rows[self._next :] if self._next else self._rows
+        self._rows, self._next = [], 0
+        return rows
+
+
+class SQLiteBackend(Backend):
+    """
+    An in-process SQLite database in WAL mode, for single node deployments and
+    for running the data path without a server. Each thread keeps its own
+    connection, so the Database.run_async workers never share one, and every
+    connection reuses its prepared statements from sqlite3's statement cache.
+    A thread holds one transaction at a time, Database calls don't nest.
+    """
+
+    name = "sqlite"
+    Error = sqlite3.Error
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            # Transactions are begun by checkout, sqlite3 shouldn't open any of its own.
+            conn = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT}")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def connect(self):
+        if dirname(self.path):
+            makedirs(dirname(self.path), exist_ok=True)
+        self._connection()
+        info(f"DATABASE: Opened SQLite database at {self.path}")
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = local()
+        info("DATABASE: SQLite database closed")
+
+    def checkout(self, write: bool) -> sqlite3.Connection:
+        conn = self._connection()
+        # Writers take the lock up front, a read transaction upgraded to a write
+        # fails with SQLITE_BUSY instead of waiting when another writer got in first.
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        return conn
+
+    def checkin(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+
+    def cursor(self, conn: sqlite3.Connection) -> SQLiteCursor:
+        return SQLiteCursor(conn)
+
+    def set_timeout(self, cur: SQLiteCursor, timeout: int):
+        cur.timeout = timeout
+
+    def execute_values(
+        self, cur: SQLiteCursor, query: str, rows: Sequence[Tuple[Any, ...]], page_size: Optional[int], fetch: bool
+    ) -> List[Tuple[Any, ...]]:
+        # Rows are bound to one prepared statement in process, so there are no pages to size.
+        sql = translate_values(query, len(rows[0]))
+        if not fetch:
+            cur._execute(query, sql, rows, many=True)
+            return []
+        # executemany can't return rows, RETURNING needs a statement per row.
+        returned: List[Tuple[Any, ...]] = []
+        for row in rows:
+            cur._execute(query, sql, row)
+            returned.extend(cur.fetchall())
+        return returned
@@ -0,0 +1,189 @@
+from asyncio import Event, Future, Lock, Task, create_task, get_running_loop, wait_for
+from logging import error as err, warning
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import DB_WRITE_BATCH_ROWS, DB_WRITE_FLUSH_INTERVAL
+from database.database import Database
+
+Row = Tuple[Any, ...]
+
+
+class _Batch:
+    """
+    Rows queued back to back for one statement, written with a single execute_values.
+    """
+
+    __slots__ = ("query", "key_size", "rows", "positions", "waiters")
+
+    def __init__(self, query: str, key_size: int):
+        self.query = query
+        self.key_size = key_size
+        self.rows: List[Row] = []
+        self.positions: Dict[Row, int] = {}
+        self.waiters: List[Future[None]] = []
+
+    def add(self, rows: Sequence[Row]) -> int:
+        """
+        :returns: how many rows the batch grew by, rows replacing a queued row with the same key don't count
+        """
+        added = 0
+        for row in rows:
+            if not self.key_size:
+                self.rows.append(row)
+                added += 1
+                continue
+            key = row[: self.key_size]
+            position = self.positions.get(key)
+            if position is None:
+                self.positions[key] = len(self.rows)
+                self.rows.append(row)
+                added += 1
+            else:
+                self.rows[position] = row
+        return added
+
+
+class WriteBuffer:
+    """
+    Write-behind queue in front of Database. Writes are buffered and flushed
+    together, by a background task once max_rows rows are queued or
+    flush_interval seconds after the first one, in a single transaction with
+    one multi-row statement per batch.
+
+    Statements are ``INSERT ... VALUES %s`` with any ON CONFLICT clause, or
+    ``DELETE ... WHERE key IN (VALUES %s)``. Consecutive writes of the same statement
+    share a batch and batches run in the order they were queued, so a delete
+    followed by an insert of the same row still ends with the row stored.
+    """
+
+    def __init__(self, max_rows: int = DB_WRITE_BATCH_ROWS, flush_interval: float = DB_WRITE_FLUSH_INTERVAL):
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self._batches: List[_Batch] = []
+        self._rows = 0
+        self._queued = Event()
+        self._full = Event()
+        self._flush_lock = Lock()
+        self._task: Optional[Task[None]] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = create_task(self._run())
+
+    async def close(self):
+        """
+        Stops the background flushes and writes whatever is still queued.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _queue(self, query: str, rows: Sequence[Row], key_size: int) -> _Batch:
+        last = self._batches[-1] if self._batches else None
+        if last is None or last.query != query or last.key_size != key_size:
+            last = _Batch(query, key_size)
+            self._batches.append(last)
+        self._rows += last.add(rows)
+        self._queued.set()
+        if self._rows >= self.max_rows:
+            self._full.set()
+        return last
+
+    def enqueue(self, query: str, rows: Sequence[Row], key_size: int = 0):
+        """
+        Queues rows without waiting for them, a failed flush is only logged.
+
+        :param key_size: leading columns that make up the conflict key of an upsert, a row
+            queued again with the same key replaces the earlier one so the statement never
+            touches a row twice
+        """
+        if rows:
+            self._queue(query, rows, key_size)
+
+    async def write(self, query: str, rows: Sequence[Row], key_size: int = 0, immediate: bool = False):
+        """
+        Queues rows like enqueue and waits until they are committed.
+
+        :param immediate: flush now rather than at the next size or time trigger
+        :raises Exception: the backend's error if the batch holding the rows couldn't be written
+        """
+        if not rows:
+            return
+        future: Future[None] = get_running_loop().create_future()
+        self._queue(query, rows, key_size).waiters.append(future)
+        if immediate or self._task is None:
+            if self._task is None:
+                await self.flush()
+            else:
+                self._full.set()
+        await future
+
+    async def flush(self):
+        """
+        Writes everything queued so far, failures are handed to the writers waiting on them.
+        """
+        async with self._flush_lock:
+            batches, self._batches, self._rows = self._batches, [], 0
+            self._queued.clear()
+            self._full.clear()
+            if not batches:
+                return
+            try:
+                errors = await Database.run_async(self._write, batches)
+            except Exception as exc:
+                err(f"DATABASE: Failed to flush {len(batches)} queued writes: {exc}")
+                errors = [exc] * len(batches)
+            for batch, exc in zip(batches, errors):
+                for future in batch.waiters:
+                    if future.done():
+                        continue
+                    if exc is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(exc)
+
+    @staticmethod
+    def _write(batches: List[_Batch]) -> List[Optional[Exception]]:
+        """
+        Writes every batch in one transaction, and if that fails each batch in its
+        own so one bad write doesn't take the rest down with it.
+
+        :returns: the error of each batch, None for the ones that were committed
+        """
+        try:
+            with Database.transaction() as cur:
+                for batch in batches:
+                    Database.execute_values(cur, batch.query, batch.rows)
+            return [None] * len(batches)
+        except Database.error_type() as exc:
+            if len(batches) == 1:
+                err(f"DATABASE: Failed to write {len(batches[0].rows)} rows: {exc}\nquery: {batches[0].query}")
+                return [exc]
+            warning(f"DATABASE: Flush of {len(batches)} batches failed, writing them one by one: {exc}")
+
+        errors: List[Optional[Exception]] = []
+        for batch in batches:
+            try:
+                with Database.transaction() as cur:
+                    Database.execute_values(cur, batch.query, batch.rows)
+                errors.append(None)
+            except Database.error_type() as exc:
+                err(f"DATABASE: Failed to write {len(batch.rows)} rows: {exc}\nquery: {batch.query}")
+                errors.append(exc)
+        return errors
+
+    async def _run(self):
+        while True:
+            await self._queued.wait()
+            try:
+                await wait_for(self._full.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+            await self.flush()
+
+
+write_buffer = WriteBuffer()
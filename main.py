@@ -9,6 +9,8 @@ from cogs.cf_cog import CFCog
 from utils.context_manager import ContextManager
 from database.database import Database
 from database.create_database import add_tables
+from database.write_buffer import write_buffer
+from codeforces.api import close_api_session
 
 
 async def main():
@@ -16,6 +18,7 @@ async def main():
 
     Database.establish_connection()
     add_tables()
+    write_buffer.start()
 
     bot = commands.Bot(command_prefix="$", intents=Intents.all(),help_command=None)
     await bot.add_cog(CFCog(bot))
@@ -31,14 +34,16 @@ async def main():
         HQ = await bot.fetch_channel(ADMIN_CHANNEL_ID)
         await HQ.send(f"Logged in as User: {bot.user.name} ID: `{bot.user.id}`")  # type: ignore
 
-        # Removing all Roles
-        await CFCog.remove_roles(bot)
-        info("Removed all roles from all users.")
-        await HQ.send("Removed all roles from all users.")  # type: ignore
+        # Resetting rank roles, on_ready fires again on reconnects and joins the same reset
+        CFCog.remove_roles(bot, HQ.send)  # type: ignore
 
 
     assert DISCORD_API_TOKEN is not None
-    await bot.start(DISCORD_API_TOKEN)
+    try:
+        await bot.start(DISCORD_API_TOKEN)
+    finally:
+        await write_buffer.close()
+        await close_api_session()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,208 @@
+from asyncio import Semaphore, Task, create_task, gather
+from typing import Any, Awaitable, Callable, Collection, Dict, List, NamedTuple, Optional, Set, Tuple
+from logging import error as err, info
+
+from discord import Guild, HTTPException, Member, Role
+
+# Codeforces ranks, lowest first, as user.info spells them.
+RANK_LADDER = (
+    "newbie",
+    "pupil",
+    "specialist",
+    "expert",
+    "candidate master",
+    "master",
+    "international master",
+    "grandmaster",
+    "international grandmaster",
+    "legendary grandmaster",
+)
+# Role edits in flight per guild, discord.py waits out any 429s on top of this.
+MAX_CONCURRENT_ROLE_EDITS = 4
+
+
+class RoleSyncReport(NamedTuple):
+    added: int = 0
+    removed: int = 0
+    # Members whose rank role was already right, no request was made for them.
+    skipped: int = 0
+    failed: int = 0
+    # Registered users who aren't members of the guild.
+    missing: int = 0
+
+    def __add__(self, other: "RoleSyncReport") -> "RoleSyncReport":  # type: ignore
+        return RoleSyncReport(*(a + b for a, b in zip(self, other)))
+
+    def __str__(self) -> str:
+        return (
+            f"added {self.added}, removed {self.removed}, skipped {self.skipped}, "
+            f"failed {self.failed}, not in guild {self.missing}"
+        )
+
+
+def resolve_rank_roles(guild: Guild, role_ids: Dict[str, int]) -> Dict[str, Role]:
+    """
+    Maps each rank to its role in the guild, by the configured id or else by a
+    role named after the rank. Ranks the guild has no role for are left out.
+    """
+    by_name = {role.name.lower(): role for role in guild.roles}
+    rank_roles: Dict[str, Role] = {}
+    for rank in RANK_LADDER:
+        role = guild.get_role(role_ids[rank]) if rank in role_ids else None
+        if role is None:
+            role = by_name.get(rank)
+        if role is not None:
+            rank_roles[rank] = role
+    return rank_roles
+
+
+async def sync_guild_roles(
+    guild: Guild, ranks: Dict[int, str], role_ids: Dict[str, int]
+) -> RoleSyncReport:
+    """
+    Gives every member in ranks the role of their rank and takes away any other
+    rank role, only calling Discord for members whose roles differ.
+
+    :param ranks: member id -> Codeforces rank, members left out are not touched
+    """
+    rank_roles = resolve_rank_roles(guild, role_ids)
+    managed: Set[Role] = set(rank_roles.values())
+
+    changes: List[Tuple[Member, List[Role], List[Role]]] = []
+    skipped = missing = 0
+    for member_id, rank in ranks.items():
+        member = guild.get_member(member_id)
+        if member is None:
+            missing += 1
+            continue
+        target = rank_roles.get(rank)
+        current = {role for role in member.roles if role in managed}
+        add = [target] if target is not None and target not in current else []
+        remove = [role for role in current if role != target]
+        if not add and not remove:
+            skipped += 1
+            continue
+        changes.append((member, add, remove))
+
+    semaphore = Semaphore(MAX_CONCURRENT_ROLE_EDITS)
+
+    async def apply(member: Member, add: List[Role], remove: List[Role]) -> bool:
+        async with semaphore:
+            try:
+                if remove:
+                    await member.remove_roles(*remove, reason="Codeforces rank changed")
+                if add:
+                    await member.add_roles(*add, reason="Codeforces rank changed")
+                return True
+            except HTTPException as exc:
+                err(f"Failed to update rank roles of {member} in {guild}: {exc}")
+                return False
+
+    results = await gather(*(apply(*change) for change in changes))
+    applied = [change for change, ok in zip(changes, results) if ok]
+    report = RoleSyncReport(
+        added=sum(len(add) for _, add, _ in applied),
+        removed=sum(len(remove) for _, _, remove in applied),
+        skipped=skipped,
+        failed=len(changes) - len(applied),
+        missing=missing,
+    )
+    info(f"Synced rank roles in {guild}: {report}")
+    return report
+
+
+class RoleResetJob:
+    """
+    Strips rank roles that members shouldn't hold, walking only the members of
+    the rank roles rather than the whole guild. Members already handled are
+    remembered until a run completes, so a job started again after a reconnect
+    resumes where the last one stopped. Once roles are clean a run makes no
+    requests at all.
+    """
+
+    # Progress is reported after this many members.
+    PROGRESS_EVERY = 50
+
+    def __init__(self, role_ids: Dict[str, int]):
+        self.role_ids = role_ids
+        self.done: Set[Tuple[int, int]] = set()
+        self.removed = 0
+        self.failed = 0
+        self.task: Optional[Task[None]] = None
+
+    def start(
+        self,
+        guilds: List[Guild],
+        ranks: Dict[int, str],
+        on_progress: Optional[Callable[[str], Awaitable[Any]]] = None,
+        unknown: Collection[int] = (),
+    ) -> Task[None]:
+        """
+        Starts the reset in the background, or returns the running one.
+
+        :param ranks: member id -> rank of registered users, their own rank role is kept
+        :param unknown: registered members whose rank isn't known yet, their roles are left alone
+        """
+        if self.task is None or self.task.done():
+            self.task = create_task(self.run(guilds, ranks, on_progress, unknown))
+        return self.task
+
+    async def run(
+        self,
+        guilds: List[Guild],
+        ranks: Dict[int, str],
+        on_progress: Optional[Callable[[str], Awaitable[Any]]] = None,
+        unknown: Collection[int] = (),
+    ):
+        async def report(message: str):
+            info(message)
+            if on_progress is not None:
+                try:
+                    await on_progress(message)
+                except HTTPException as exc:
+                    err(f"Failed to report role reset progress: {exc}")
+
+        self.removed = self.failed = 0
+        semaphore = Semaphore(MAX_CONCURRENT_ROLE_EDITS)
+
+        async def strip(guild: Guild, member: Member, stale: List[Role]):
+            async with semaphore:
+                try:
+                    await member.remove_roles(*stale, reason="Rank role reset")
+                    self.removed += len(stale)
+                    self.done.add((guild.id, member.id))
+                except HTTPException as exc:
+                    self.failed += 1
+                    err(f"Failed to reset rank roles of {member} in {guild}: {exc}")
+
+        touched = False
+        for guild in guilds:
+            rank_roles = resolve_rank_roles(guild, self.role_ids)
+            managed = set(rank_roles.values())
+            holders = {member.id: member for role in managed for member in role.members}
+
+            pending: List[Tuple[Member, List[Role]]] = []
+            for member in holders.values():
+                if member.bot or member.id in unknown or (guild.id, member.id) in self.done:
+                    continue
+                keep = rank_roles.get(ranks[member.id]) if member.id in ranks else None
+                stale = [role for role in member.roles if role in managed and role != keep]
+                if stale:
+                    pending.append((member, stale))
+                else:
+                    self.done.add((guild.id, member.id))
+
+            if not pending:
+                continue
+            touched = True
+            await report(f"Resetting rank roles of {len(pending)} members in {guild}.")
+            for start in range(0, len(pending), self.PROGRESS_EVERY):
+                batch = pending[start : start + self.PROGRESS_EVERY]
+                await gather(*(strip(guild, member, stale) for member, stale in batch))
+                await report(f"{guild}: {min(start + len(batch), len(pending))}/{len(pending)} members reset.")
+
+        if touched:
+            await report(f"Rank role reset finished, {self.removed} roles removed, {self.failed} members failed.")
+        # Only an interrupted or partly failed reset needs to remember who it already handled.
+        if self.failed == 0:
+            self.done.clear()